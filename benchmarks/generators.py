@@ -0,0 +1,132 @@
+"""Seeded synthetic inputs for the benchmarks.
+
+Every generator takes a size `n` and a seed, and returns the same input for
+the same arguments.
+"""
+import random
+
+import numpy as np
+from dsc40graph import DirectedGraph, UndirectedGraph
+
+
+def random_graph(n, seed, average_degree=4):
+    """An Erdős–Rényi-style random graph with about n * average_degree / 2
+    edges, and a weight for each edge.
+
+    Returns the graph and a dictionary mapping each edge, as a frozenset of
+    its endpoints, to its weight.
+    """
+    rng = random.Random(seed)
+    graph = UndirectedGraph()
+    for node in range(n):
+        graph.add_node(node)
+
+    weights = {}
+    for _ in range(n * average_degree // 2):
+        u, v = rng.randrange(n), rng.randrange(n)
+        if u != v:
+            graph.add_edge(u, v)
+            weights[frozenset((u, v))] = rng.random()
+    return graph, weights
+
+
+def random_csr_graph(n, seed, average_degree=4):
+    """The graph of `random_graph` as a CSRGraph, with the weights stored in it."""
+    from csr_graph import CSRGraph
+    graph, weights = random_graph(n, seed, average_degree)
+    return CSRGraph.from_graph(graph, weights=lambda u, v: weights[frozenset((u, v))])
+
+
+def power_law_graph(n, seed, edges_per_node=2):
+    """A Barabási–Albert preferential attachment graph, whose degrees follow
+    a power law, with a weight for each edge."""
+    rng = random.Random(seed)
+    graph = UndirectedGraph()
+    weights = {}
+    # every endpoint of every edge, so that sampling from it is sampling
+    # nodes in proportion to their degree
+    endpoints = []
+
+    graph.add_node(0)
+    for node in range(1, n):
+        targets = {rng.choice(endpoints) if endpoints else 0 for _ in range(edges_per_node)}
+        for target in targets:
+            graph.add_edge(node, target)
+            weights[frozenset((node, target))] = rng.random()
+            endpoints.extend((node, target))
+    return graph, weights
+
+
+def bipartite_graph(n, seed, average_degree=4):
+    """A random graph whose edges all join an even node to an odd node."""
+    rng = random.Random(seed)
+    graph = UndirectedGraph()
+    for node in range(n):
+        graph.add_node(node)
+    for _ in range(n * average_degree // 2):
+        u = rng.randrange(0, n, 2)
+        v = rng.randrange(1, n, 2) if n > 1 else u
+        if u != v:
+            graph.add_edge(u, v)
+    return graph
+
+
+def deep_tree(n, seed):
+    """A chain-like tree: each node's parent is one of the few nodes just
+    before it. Returns the tree, its root, and a value for each node."""
+    rng = random.Random(seed)
+    graph = DirectedGraph()
+    graph.add_node(0)
+    for node in range(1, n):
+        graph.add_edge(max(0, node - rng.randint(1, 3)), node)
+    return graph, 0, {node: rng.randrange(n) for node in range(n)}
+
+
+def wide_tree(n, seed, fan_out=1000):
+    """A shallow tree in which every node has up to `fan_out` children."""
+    rng = random.Random(seed)
+    graph = DirectedGraph()
+    graph.add_node(0)
+    for node in range(1, n):
+        graph.add_edge((node - 1) // fan_out, node)
+    return graph, 0, {node: rng.randrange(n) for node in range(n)}
+
+
+def random_array(n, seed):
+    """n distinct-ish random integers."""
+    return np.random.default_rng(seed).integers(0, 10 * n, n).tolist()
+
+
+def duplicate_heavy_array(n, seed, distinct=10):
+    """n random integers drawn from only `distinct` values."""
+    return np.random.default_rng(seed).integers(0, distinct, n).tolist()
+
+
+def adversarial_array(n, seed):
+    """An already-sorted array, the worst case for naive pivot choices."""
+    return list(range(n))
+
+
+def red_blue_points(n, seed, noise=0.1):
+    """n points, mostly blue below 0 and red above it, with a fraction
+    `noise` of the colors flipped. Returns the points and their colors."""
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=n)
+    red = (data > 0) ^ (rng.random(n) < noise)
+    colors = np.where(red, 'red', 'blue')
+    return data.tolist(), colors.tolist()
+
+
+def sorted_pair(n, seed):
+    """Two sorted integer arrays of length n."""
+    rng = np.random.default_rng(seed)
+    A = np.sort(rng.integers(0, 10 * n, n)).tolist()
+    B = np.sort(rng.integers(0, 10 * n, n)).tolist()
+    return A, B
+
+
+def point_cloud(n, seed, dimensions=2, clusters=10):
+    """n points in the unit cube, scattered around a few random centers."""
+    rng = np.random.default_rng(seed)
+    centers = rng.random((clusters, dimensions))
+    return centers[rng.integers(0, clusters, n)] + rng.normal(scale=0.02, size=(n, dimensions))
@@ -0,0 +1,282 @@
+"""Times every algorithm in src/ on synthetic inputs of increasing size.
+
+Usage
+-----
+Run the benchmarks and write the results as JSON::
+
+    python benchmarks/run_benchmarks.py run --sizes 1000 10000 100000 --output results.json
+
+Compare two sets of results, flagging benchmarks which got slower by more
+than the threshold (the exit status is 1 if any did)::
+
+    python benchmarks/run_benchmarks.py compare baseline.json results.json --threshold 1.25
+
+Each benchmark is timed several times, and the fastest time is reported. The
+peak memory allocated while running it once more is measured with
+tracemalloc, which also sees NumPy's allocations. For each benchmark, the
+scaling exponent is the slope of log(time) against log(n), so an Θ(n)
+algorithm should have an exponent near 1 and an Θ(n²) one near 2.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generators
+from assign_good_and_evil import assign_good_and_evil
+from biggest_descendent import biggest_descendent
+from cluster import cluster
+from csr_graph import CSRGraph
+from disjoint_set_forest import DisjointSetForest
+from knn_distance import knn_distance
+from min_ell_theta import minimize_ell, minimize_ell_sorted
+from mode import mode
+from slc import slc, slc_points
+from swap_sum import swap_sum
+
+
+def _slc(n, seed):
+    graph, weights = generators.random_graph(n, seed)
+    return lambda: slc(graph, lambda edge: weights[frozenset(edge)], max(1, n // 10))
+
+
+def _slc_points(n, seed):
+    points = generators.point_cloud(n, seed)
+    return lambda: slc_points(points, 10)
+
+
+def _cluster(level):
+    def setup(n, seed):
+        graph, weights = generators.random_graph(n, seed)
+        return lambda: cluster(graph, lambda u, v: weights[frozenset((u, v))], level)
+    return setup
+
+
+def _cluster_csr(level):
+    def setup(n, seed):
+        graph = generators.random_csr_graph(n, seed)
+        return lambda: cluster(graph, graph.weight, level)
+    return setup
+
+
+def _cluster_power_law(n, seed):
+    graph, weights = generators.power_law_graph(n, seed)
+    return lambda: cluster(graph, lambda u, v: weights[frozenset((u, v))], 0.5)
+
+
+def _assign_good_and_evil(n, seed):
+    graph = generators.bipartite_graph(n, seed)
+    return lambda: assign_good_and_evil(graph)
+
+
+def _assign_good_and_evil_csr(n, seed):
+    graph = CSRGraph.from_graph(generators.bipartite_graph(n, seed))
+    return lambda: assign_good_and_evil(graph)
+
+
+def _biggest_descendent_deep(n, seed):
+    graph, root, value = generators.deep_tree(n, seed)
+    return lambda: biggest_descendent(graph, root, value)
+
+
+def _biggest_descendent_wide(n, seed):
+    graph, root, value = generators.wide_tree(n, seed)
+    return lambda: biggest_descendent(graph, root, value)
+
+
+def _disjoint_set_forest(n, seed):
+    xs = generators.random_array(n, seed)
+    ys = generators.random_array(n, seed + 1)
+
+    def run():
+        dsf = DisjointSetForest.of_size(n)
+        dsf.union_many([x % n for x in xs], [y % n for y in ys])
+        return dsf.number_of_sets
+    return run
+
+
+def _knn_distance(arrays):
+    def setup(n, seed):
+        arr = arrays(n, seed)
+        return lambda: knn_distance(arr, n // 2, max(1, n // 3))
+    return setup
+
+
+def _mode(arrays):
+    def setup(n, seed):
+        numbers = arrays(n, seed)
+        return lambda: mode(numbers)
+    return setup
+
+
+def _minimize_ell(n, seed):
+    data, colors = generators.red_blue_points(n, seed)
+    return lambda: minimize_ell(data, colors)
+
+
+def _minimize_ell_sorted(n, seed):
+    data, colors = generators.red_blue_points(n, seed)
+    order = sorted(range(n), key=data.__getitem__)
+    data = [data[i] for i in order]
+    colors = [colors[i] for i in order]
+    return lambda: minimize_ell_sorted(data, colors)
+
+
+def _swap_sum(n, seed):
+    A, B = generators.sorted_pair(n, seed)
+    return lambda: swap_sum(A, B)
+
+
+# each benchmark's setup, and the largest size it is run at; graph inputs
+# are built from dsc40graph objects, which cap the practical size
+BENCHMARKS = {
+    'slc': (_slc, 10**6),
+    'slc_points': (_slc_points, 10**5),
+    'cluster/random': (_cluster(0.5), 10**6),
+    'cluster/random_csr': (_cluster_csr(0.5), 10**6),
+    'cluster/singletons': (_cluster(0.99), 10**6),
+    'cluster/singletons_csr': (_cluster_csr(0.99), 10**6),
+    'cluster/power_law': (_cluster_power_law, 10**6),
+    'assign_good_and_evil': (_assign_good_and_evil, 10**6),
+    'assign_good_and_evil/csr': (_assign_good_and_evil_csr, 10**6),
+    'biggest_descendent/deep': (_biggest_descendent_deep, 10**6),
+    'biggest_descendent/wide': (_biggest_descendent_wide, 10**6),
+    'DisjointSetForest': (_disjoint_set_forest, 10**7),
+    'knn_distance/random': (_knn_distance(generators.random_array), 10**7),
+    'knn_distance/duplicates': (_knn_distance(generators.duplicate_heavy_array), 10**7),
+    'knn_distance/adversarial': (_knn_distance(generators.adversarial_array), 10**7),
+    'mode/random': (_mode(generators.random_array), 10**7),
+    'mode/duplicates': (_mode(generators.duplicate_heavy_array), 10**7),
+    'minimize_ell': (_minimize_ell, 10**7),
+    'minimize_ell_sorted': (_minimize_ell_sorted, 10**7),
+    'swap_sum': (_swap_sum, 10**7),
+}
+
+
+def time_benchmark(setup, n, seed, repeats):
+    """Returns the fastest of `repeats` timings of one benchmark, and the
+    peak memory allocated while running it."""
+    run = setup(n, seed)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(timings), peak
+
+
+def scaling_exponent(sizes, seconds):
+    """The least squares slope of log(seconds) against log(size)."""
+    points = [(math.log(n), math.log(t)) for n, t in zip(sizes, seconds) if t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def run(sizes, names, seed, repeats, time_limit):
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'benchmarks': {},
+    }
+
+    for name in names:
+        setup, max_size = BENCHMARKS[name]
+        measurements = []
+        for n in sizes:
+            if n > max_size:
+                print(f'{name:<28} n={n:<10} skipped (above {max_size})')
+                continue
+            seconds, peak = time_benchmark(setup, n, seed, repeats)
+            measurements.append({'n': n, 'seconds': seconds, 'peak_bytes': peak})
+            print(f'{name:<28} n={n:<10} {seconds:10.4f}s {peak / 2**20:10.1f} MiB')
+            if seconds > time_limit:
+                print(f'{name:<28} stopping: over {time_limit}s')
+                break
+
+        results['benchmarks'][name] = {
+            'measurements': measurements,
+            'scaling_exponent': scaling_exponent(
+                [m['n'] for m in measurements], [m['seconds'] for m in measurements]
+            ),
+        }
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Returns the (name, n, ratio) of every measurement which is more than
+    `threshold` times slower in `current` than in `baseline`."""
+    regressions = []
+    for name, result in current['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        before = {m['n']: m['seconds'] for m in baseline['benchmarks'][name]['measurements']}
+        for measurement in result['measurements']:
+            n = measurement['n']
+            if n in before and before[n] > 0:
+                ratio = measurement['seconds'] / before[n]
+                flag = 'REGRESSION' if ratio > threshold else ''
+                print(f'{name:<28} n={n:<10} {ratio:6.2f}x {flag}')
+                if ratio > threshold:
+                    regressions.append((name, n, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[10**3, 10**4, 10**5])
+    run_parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeats', type=int, default=3)
+    run_parser.add_argument('--time-limit', type=float, default=60.0,
+                            help='skip the larger sizes of a benchmark once one takes longer than this')
+    run_parser.add_argument('--output', default='benchmark_results.json')
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=1.25)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run(sorted(args.sizes), args.only, args.seed, args.repeats, args.time_limit)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        for name, result in results['benchmarks'].items():
+            if result['scaling_exponent'] is not None:
+                print(f'{name:<28} scaling exponent {result["scaling_exponent"]:.2f}')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    return 1 if compare(baseline, current, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,12 @@
 from dsc40graph import UndirectedGraph
-from typing import Dict, Optional
+import instrumentation
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    from csr_graph import CSRGraph, csr_two_coloring
+except ImportError:  # without NumPy there are no CSRGraphs, and every graph is searched
+    CSRGraph = None
+
 
 def assign_good_and_evil(graph: UndirectedGraph) -> Optional[Dict[str, str]]:
     """
@@ -10,7 +17,9 @@ def assign_good_and_evil(graph: UndirectedGraph) -> Optional[Dict[str, str]]:
     Parameters
     ----------
     graph : UndirectedGraph
-        graph of type UndirectedGraph from the dsc40graph package.
+        graph of type UndirectedGraph from the dsc40graph package, or an
+        undirected csr_graph.CSRGraph, which is labeled with whole-array
+        operations by `csr_graph.csr_two_coloring`.
          
     Returns
     -------
@@ -27,26 +36,157 @@ def assign_good_and_evil(graph: UndirectedGraph) -> Optional[Dict[str, str]]:
     >>> example_graph.add_edge('USC', 'OSU')
     >>> example_graph.add_edge('USC', 'UCB')
     >>> example_graph.add_node('UCSD')
-    >>> assign_good_and_evil(example_graph)
-    {'OSU': 'good', 'Michigan': 'evil', 'USC': 'evil', 'UCB': 'good', 'UCSD': 'good'}
+    >>> labels = assign_good_and_evil(example_graph)
+    >>> sorted(labels)
+    ['Michigan', 'OSU', 'UCB', 'UCSD', 'USC']
+    >>> all(labels[u] != labels[v] for u, v in example_graph.edges)
+    True
+
+    # A triangle of rivalries cannot be labeled.
+    >>> example_graph.add_edge('Michigan', 'USC')
+    >>> assign_good_and_evil(example_graph) is None
+    True
     """
+    if CSRGraph is not None and isinstance(graph, CSRGraph):
+        colors = csr_two_coloring(graph)
+        if colors is None:
+            return None
+        return {
+            graph.label_of(node_id): 'evil' if color else 'good'
+            for node_id, color in enumerate(colors.tolist())
+        }
+
+    instrumented = instrumentation.ENABLED
     labels = {}
     for node in graph.nodes:
         if node not in labels:
-            stack = [(node, 'good')]
+            labels[node] = 'good'
+            stack = [node]
             while stack:
-                node, label = stack.pop()
-                if node in labels:
-                    if labels[node] != label:
+                node = stack.pop()
+                opposite = 'evil' if labels[node] == 'good' else 'good'
+                neighbors = graph.neighbors(node)
+                if instrumented:
+                    instrumentation.count('assign_good_and_evil.nodes_visited')
+                    instrumentation.count('assign_good_and_evil.edges_visited', len(neighbors))
+                for neighbor in neighbors:
+                    if neighbor not in labels:
+                        labels[neighbor] = opposite
+                        stack.append(neighbor)
+                    elif labels[neighbor] != opposite:
                         return None
-                else:
-                    labels[node] = label
-                    for neighbor in graph.neighbors(node):
-                        stack.append((neighbor, 'evil' if label == 'good' else 'good'))
     return labels
 
 
+class RivalryTracker:
+    """
+    Labels universities as “good” or “evil” as rivalries arrive one at a time.
+
+    Each school is kept in a disjoint set forest together with its parity
+    relative to its parent, so that two schools in the same set are known to
+    have the same label if their parities relative to the representative
+    match. Adding a rivalry takes near-constant amortized time, and the first
+    rivalry which makes the labeling impossible is reported as soon as it
+    arrives.
+
+    Parameters
+    ----------
+    schools : Iterable
+        schools to start with, which need not have any rivalries
+
+    >>> tracker = RivalryTracker(['UCSD'])
+    >>> tracker.add_rivalries([('Michigan', 'OSU'), ('USC', 'OSU')])
+    >>> tracker.add_rivalry('USC', 'UCB')
+    True
+    >>> tracker.labels()
+    {'UCSD': 'good', 'Michigan': 'good', 'OSU': 'evil', 'USC': 'good', 'UCB': 'evil'}
+    >>> tracker.add_rivalries([('UCB', 'UCSD'), ('Michigan', 'UCB'), ('UCSD', 'Michigan')])
+    ('UCSD', 'Michigan')
+    >>> tracker.conflict
+    ('UCSD', 'Michigan')
+    >>> tracker.labels() is None
+    True
+    """
+
+    def __init__(self, schools: Iterable[Any] = ()):
+        self._parent = {}
+        # the parity of each school relative to its parent: 0 if they have
+        # the same label, 1 if they have opposite labels
+        self._parity = {}
+        self._rank = {}
+        self.conflict = None
+        for school in schools:
+            self.add_school(school)
+
+    def add_school(self, school: Any):
+        """Adds a school with no rivalries, if it is not already present."""
+        if school not in self._parent:
+            self._parent[school] = school
+            self._parity[school] = 0
+            self._rank[school] = 0
+
+    def add_rivalry(self, u: Any, v: Any) -> bool:
+        """Adds a rivalry between u and v. Returns False if it makes a
+        labeling impossible, in which case it is recorded as the conflict."""
+        self.add_school(u)
+        self.add_school(v)
+        u_rep, u_parity = self._find(u)
+        v_rep, v_parity = self._find(v)
+
+        if u_rep == v_rep:
+            if u_parity == v_parity:
+                if self.conflict is None:
+                    self.conflict = (u, v)
+                return False
+            return True
+
+        if self._rank[u_rep] > self._rank[v_rep]:
+            u_rep, v_rep = v_rep, u_rep
+        self._parent[u_rep] = v_rep
+        self._parity[u_rep] = u_parity ^ v_parity ^ 1
+        if self._rank[u_rep] == self._rank[v_rep]:
+            self._rank[v_rep] += 1
+        return True
+
+    def add_rivalries(self, rivalries: Iterable[Tuple[Any, Any]]) -> Optional[Tuple[Any, Any]]:
+        """Adds a batch of rivalries, returning the first one which makes a
+        labeling impossible, or None if there is none."""
+        first_conflict = None
+        for u, v in rivalries:
+            if not self.add_rivalry(u, v) and first_conflict is None:
+                first_conflict = (u, v)
+        return first_conflict
+
+    def labels(self) -> Optional[Dict[Any, str]]:
+        """Returns the current labeling as a dictionary mapping each school
+        to 'good' or 'evil', or None if no labeling is possible. The first
+        school added in each group of connected rivals is labeled 'good'."""
+        if self.conflict is not None:
+            return None
+        # the first school added in each group of rivals is labeled 'good'
+        flip = {}
+        labels = {}
+        for school in self._parent:
+            root, parity = self._find(school)
+            if root not in flip:
+                flip[root] = parity
+            labels[school] = 'evil' if parity ^ flip[root] else 'good'
+        return labels
 
+    def _find(self, x):
+        path = []
+        while self._parent[x] != x:
+            path.append(x)
+            x = self._parent[x]
+        root = x
 
+        # compress the path, starting next to the root, so that each parent's
+        # parity is already relative to the root when its child is updated
+        for node in reversed(path):
+            parent = self._parent[node]
+            if parent != root:
+                self._parity[node] ^= self._parity[parent]
+                self._parent[node] = root
 
+        return root, (self._parity[path[0]] if path else 0)
 
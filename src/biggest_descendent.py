@@ -1,5 +1,28 @@
 from dsc40graph import DirectedGraph
-from typing import Dict, Any
+from typing import Dict, Any, Callable, NamedTuple, Sequence, Union
+import operator
+
+import instrumentation
+
+
+class Monoid(NamedTuple):
+    """
+    An associative way of aggregating the values in a subtree.
+
+    `lift` turns a node's value into an aggregate, and `combine` merges two
+    aggregates. The aggregate of a subtree is the node's lifted value
+    combined with the aggregates of its children, in order.
+    """
+    combine: Callable[[Any, Any], Any]
+    lift: Callable[[Any], Any] = lambda x: x
+
+
+AGGREGATES = {
+    'max': Monoid(max),
+    'min': Monoid(min),
+    'sum': Monoid(operator.add),
+    'count': Monoid(operator.add, lambda x: 1),
+}
 
 def biggest_descendent(graph: DirectedGraph, root: Any, value: Dict[Any, int]) -> Dict[Any, int]:
     """
@@ -8,7 +31,8 @@ def biggest_descendent(graph: DirectedGraph, root: Any, value: Dict[Any, int]) -
     Parameters
     ----------
     graph : DirectedGraph
-        Graph of type DirectedGraph from the dsc40graph package.
+        Graph of type DirectedGraph from the dsc40graph package, or a
+        directed csr_graph.CSRGraph.
     root : Any
         The root node of the tree.
     value : Dict[Any, int]
@@ -19,13 +43,16 @@ def biggest_descendent(graph: DirectedGraph, root: Any, value: Dict[Any, int]) -
     biggest_values : Dict[Any, int]
         A dictionary mapping each node in the graph to the biggest descendent value.
 
+    The graph must be a tree; for DAGs and graphs with cycles, use
+    `biggest_reachable` instead.
+
     Example:
     >>> edges = [(1, 2), (1, 3), (2, 4), (2, 5), (4, 8), (4, 9), (3, 6), (3, 7)]
     >>> g = DirectedGraph()
     >>> for edge in edges: g.add_edge(*edge)
     >>> value = {1: 2, 2: 1, 3: 4, 4: 8, 5: 5, 6: 2, 7: 10, 8:3, 9: 9}
-    >>> biggest_descendent(g, 1, value)
-    {1: 10, 2: 9, 3: 10:, 4: 9, 5: 5, 6: 2, 7: 10, 8: 3, 9: 9}
+    >>> biggest_descendent(g, 1, value) == {1: 10, 2: 9, 3: 10, 4: 9, 5: 5, 6: 2, 7: 10, 8: 3, 9: 9}
+    True
 
     # Test a graph where all nodes have the same value.
     # The output should have the same value for all nodes. 
@@ -33,8 +60,8 @@ def biggest_descendent(graph: DirectedGraph, root: Any, value: Dict[Any, int]) -
     >>> g = DirectedGraph()
     >>> for edge in edges: g.add_edge(*edge)
     >>> value = {1: 5, 2: 5, 3: 5, 4: 5, 5: 5}
-    >>> biggest_descendent(g, 1, value)
-    {1: 5, 2: 5, 3: 5, 4: 5, 5: 5}
+    >>> biggest_descendent(g, 1, value) == {1: 5, 2: 5, 3: 5, 4: 5, 5: 5}
+    True
 
     # Test a linear graph where the values are decreasing. 
     # The maximum descendant value should decrease along the path.
@@ -54,13 +81,290 @@ def biggest_descendent(graph: DirectedGraph, root: Any, value: Dict[Any, int]) -
     >>> biggest_descendent(g, 1, value)
     {1: 4, 2: 4, 3: 4, 4: 4}
     """
-    biggest_values = {}
-    
-    def dfs(node):
-        biggest_values[node] = value[node]
+    return subtree_aggregate(graph, root, value, 'max')
+
+
+def subtree_aggregate(graph: DirectedGraph, root: Any, value: Dict[Any, Any],
+                      aggregate: Union[str, Monoid, Sequence[Union[str, Monoid]]] = 'max') -> Dict[Any, Any]:
+    """
+    Aggregates the values in the subtree of every node of a tree.
+
+    The tree is traversed once, iteratively, so the depth of the tree is not
+    limited by the recursion limit. Each node is handled after all of its
+    descendants, in Θ(V) time overall.
+
+    Parameters
+    ----------
+    graph : DirectedGraph
+        Graph of type DirectedGraph from the dsc40graph package, or a
+        directed csr_graph.CSRGraph.
+    root : Any
+        The root node of the tree.
+    value : Dict[Any, Any]
+        A dictionary mapping each node in the graph to its value.
+    aggregate : str, Monoid, or a sequence of them
+        The name of an aggregate in AGGREGATES ('max', 'min', 'sum' or
+        'count') or a custom Monoid. If a sequence is given, all of the
+        aggregates are computed in the same traversal.
+
+    Returns
+    -------
+    aggregates : Dict[Any, Any]
+        A dictionary mapping each node in the tree to the aggregate of its
+        subtree, or to a tuple of aggregates if a sequence was given.
+
+    Example:
+    >>> edges = [(1, 2), (1, 3), (2, 4)]
+    >>> g = DirectedGraph()
+    >>> for edge in edges: g.add_edge(*edge)
+    >>> value = {1: 2, 2: 1, 3: 4, 4: 8}
+    >>> subtree_aggregate(g, 1, value, 'sum')
+    {1: 15, 2: 9, 4: 8, 3: 4}
+    >>> subtree_aggregate(g, 1, value, ['max', 'sum', 'count'])
+    {1: (8, 15, 4), 2: (8, 9, 2), 4: (8, 8, 1), 3: (4, 4, 1)}
+
+    # A custom monoid: the product of the values in each subtree.
+    >>> subtree_aggregate(g, 1, value, Monoid(operator.mul))
+    {1: 64, 2: 8, 4: 8, 3: 4}
+
+    # Trees deeper than the recursion limit are fine.
+    >>> g = DirectedGraph()
+    >>> for i in range(10_000): g.add_edge(i, i + 1)
+    >>> subtree_aggregate(g, 0, {i: i for i in range(10_001)}, 'max')[0]
+    10000
+    """
+    single = isinstance(aggregate, (str, Monoid))
+    monoids = [
+        AGGREGATES[spec] if isinstance(spec, str) else spec
+        for spec in ([aggregate] if single else aggregate)
+    ]
+
+    # visit the nodes in preorder; in reverse, every node comes after its descendants
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(reversed(list(graph.neighbors(node))))
+
+    aggregates = dict.fromkeys(order)
+    if instrumentation.ENABLED:
+        instrumentation.count('subtree_aggregate.nodes_visited', len(order))
+        instrumentation.count('subtree_aggregate.edges_visited', len(order) - 1)
+
+    if single:
+        combine, lift = monoids[0]
+        for node in reversed(order):
+            result = lift(value[node])
+            for child in graph.neighbors(node):
+                result = combine(result, aggregates[child])
+            aggregates[node] = result
+        return aggregates
+
+    for node in reversed(order):
+        results = [lift(value[node]) for _, lift in monoids]
         for child in graph.neighbors(node):
-            dfs(child)
-            biggest_values[node] = max(biggest_values[node], biggest_values[child])
-    
-    dfs(root)
-    return biggest_values
\ No newline at end of file
+            child_results = aggregates[child]
+            for i, (combine, _) in enumerate(monoids):
+                results[i] = combine(results[i], child_results[i])
+        aggregates[node] = tuple(results)
+    return aggregates
+
+
+class SubtreeIndex:
+    """
+    Answers subtree aggregate queries on a tree whose values change.
+
+    The tree is flattened with an Euler tour, so that every subtree is a
+    contiguous range of the tour, and the values are stored in a segment tree
+    over the tour for each aggregate. Building the index takes Θ(V) time;
+    `update` and each query take Θ(log V) time.
+
+    Parameters
+    ----------
+    graph : DirectedGraph
+        Graph of type DirectedGraph from the dsc40graph package, or a
+        directed csr_graph.CSRGraph.
+    root : Any
+        The root node of the tree.
+    value : Dict[Any, Any]
+        A dictionary mapping each node in the graph to its value.
+    aggregates : sequence of str or Monoid
+        The aggregates to maintain, as in `subtree_aggregate`.
+
+    Example:
+    >>> edges = [(1, 2), (1, 3), (2, 4), (2, 5), (4, 8), (4, 9), (3, 6), (3, 7)]
+    >>> g = DirectedGraph()
+    >>> for edge in edges: g.add_edge(*edge)
+    >>> value = {1: 2, 2: 1, 3: 4, 4: 8, 5: 5, 6: 2, 7: 10, 8: 3, 9: 9}
+    >>> index = SubtreeIndex(g, 1, value, ['max', 'sum'])
+    >>> index.subtree_max(2), index.query(2, 'sum')
+    (9, 26)
+    >>> index.update(5, 20)
+    >>> index.subtree_max(1), index.subtree_max(2), index.subtree_max(3)
+    (20, 20, 10)
+    >>> index.query(1, 'sum')
+    59
+    """
+
+    def __init__(self, graph: DirectedGraph, root: Any, value: Dict[Any, Any],
+                 aggregates: Sequence[Union[str, Monoid]] = ('max',)):
+        # the Euler tour: each node's position, and the size of its subtree,
+        # which is the range [position, position + size) of the tour
+        order = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(reversed(list(graph.neighbors(node))))
+
+        self._position = {node: i for i, node in enumerate(order)}
+        self._subtree_size = dict.fromkeys(order, 1)
+        for node in reversed(order):
+            for child in graph.neighbors(node):
+                self._subtree_size[node] += self._subtree_size[child]
+
+        self._n = len(order)
+        self._trees = {}
+        for spec in aggregates:
+            combine, lift = AGGREGATES[spec] if isinstance(spec, str) else spec
+            tree = [None] * self._n + [lift(value[node]) for node in order]
+            for i in range(self._n - 1, 0, -1):
+                tree[i] = combine(tree[2 * i], tree[2 * i + 1])
+            self._trees[spec] = (tree, combine, lift)
+
+    def update(self, node: Any, new_value: Any):
+        """Changes the value of a node."""
+        i = self._position[node] + self._n
+        for tree, combine, lift in self._trees.values():
+            p = i
+            tree[p] = lift(new_value)
+            while p > 1:
+                p //= 2
+                tree[p] = combine(tree[2 * p], tree[2 * p + 1])
+
+    def query(self, node: Any, aggregate: Union[str, Monoid] = 'max') -> Any:
+        """Returns the aggregate of the values in the subtree of a node."""
+        tree, combine, _ = self._trees[aggregate]
+        left = self._position[node] + self._n
+        right = left + self._subtree_size[node]
+
+        # combine from both ends towards the middle, preserving order
+        left_result = right_result = None
+        while left < right:
+            if left & 1:
+                left_result = tree[left] if left_result is None else combine(left_result, tree[left])
+                left += 1
+            if right & 1:
+                right -= 1
+                right_result = tree[right] if right_result is None else combine(tree[right], right_result)
+            left //= 2
+            right //= 2
+
+        if left_result is None:
+            return right_result
+        if right_result is None:
+            return left_result
+        return combine(left_result, right_result)
+
+    def subtree_max(self, node: Any) -> Any:
+        """Returns the biggest value in the subtree of a node."""
+        return self.query(node, 'max')
+
+
+def biggest_reachable(graph: DirectedGraph, value: Dict[Any, int]) -> Dict[Any, int]:
+    """
+    Finds the biggest value reachable from each node of any directed graph.
+
+    Unlike `biggest_descendent`, the graph does not need to be a tree: shared
+    descendants are handled once, and cycles are allowed. The strongly
+    connected components are found with an iterative version of Tarjan's
+    algorithm, which produces them in reverse topological order, so each
+    component can be resolved from the components it reaches as soon as it
+    is found. This takes Θ(V + E) time.
+
+    Parameters
+    ----------
+    graph : DirectedGraph
+        Graph of type DirectedGraph from the dsc40graph package, or a
+        directed csr_graph.CSRGraph.
+    value : Dict[Any, int]
+        A dictionary mapping each node in the graph to an integer.
+
+    Returns
+    -------
+    biggest_values : Dict[Any, int]
+        A dictionary mapping each node in the graph to the biggest value of
+        a node reachable from it, including itself.
+
+    Example:
+    # A DAG whose nodes share a descendant.
+    >>> edges = [(1, 2), (1, 3), (2, 4), (3, 4)]
+    >>> g = DirectedGraph()
+    >>> for edge in edges: g.add_edge(*edge)
+    >>> result = biggest_reachable(g, {1: 1, 2: 5, 3: 2, 4: 3})
+    >>> [result[node] for node in [1, 2, 3, 4]]
+    [5, 5, 3, 3]
+
+    # A graph with a cycle: every node on the cycle reaches the same values.
+    >>> edges = [(1, 2), (2, 3), (3, 1), (3, 4)]
+    >>> g = DirectedGraph()
+    >>> for edge in edges: g.add_edge(*edge)
+    >>> result = biggest_reachable(g, {1: 1, 2: 7, 3: 2, 4: 3})
+    >>> [result[node] for node in [1, 2, 3, 4]]
+    [7, 7, 7, 3]
+    """
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    # the component of each node, and the biggest value reachable from each component
+    component = {}
+    biggest_of_component = []
+
+    for start in graph.nodes:
+        if start in index:
+            continue
+
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(graph.neighbors(start)))]
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(graph.neighbors(child))))
+                    break
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+
+                if low[node] == index[node]:
+                    # node is the root of a strongly connected component; every
+                    # component reachable from it has already been resolved
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component[member] = len(biggest_of_component)
+                        members.append(member)
+                        if member == node:
+                            break
+
+                    biggest = max(value[member] for member in members)
+                    for member in members:
+                        for child in graph.neighbors(member):
+                            if component[child] != len(biggest_of_component):
+                                biggest = max(biggest, biggest_of_component[component[child]])
+                    biggest_of_component.append(biggest)
+
+    return {node: biggest_of_component[component[node]] for node in graph.nodes}
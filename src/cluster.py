@@ -1,6 +1,16 @@
 from dsc40graph import UndirectedGraph
-from typing import Dict, Callable, Any, FrozenSet
+from disjoint_set_forest import DisjointSetForest
+from typing import Dict, Callable, Any, FrozenSet, Iterable, List
 from collections import deque
+from operator import itemgetter
+import instrumentation
+
+try:
+    import numpy as np
+    from csr_graph import CSRGraph, csr_components
+except ImportError:  # without NumPy there are no CSRGraphs, and every graph is searched
+    np = None
+    CSRGraph = None
 
 def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level: float) -> FrozenSet[FrozenSet[Any]]:
     """
@@ -9,15 +19,21 @@ def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level:
     Parameters
     ----------
     graph : UndirectedGraph
-        Graph of type UndirectedGraph from the dsc40graph package.
+        Graph of type UndirectedGraph from the dsc40graph package, or an
+        undirected csr_graph.CSRGraph.
     weights : Callable[[Any, Any], float]
         A function returning the weight of an edge between two nodes.
+        Wrap it in a `weight_cache.WeightCache` to compute each edge's
+        weight once, and to reuse the weights across calls. If the graph is
+        a weighted CSRGraph and this is its `weight` method, the clusters
+        are found by label propagation with `csr_graph.csr_components`
+        instead.
     level : float
         The level at which to find the clusters.
 
     Returns
     -------
-    clusters : Tuple
+    clusters : FrozenSet[FrozenSet[Any]]
         The clusters of the graph at the given level.
 
     # Doctests
@@ -32,8 +48,8 @@ def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level:
     >>> g.add_edge('b', 'c')
     >>> g.add_edge('c', 'd')
     >>> g.add_edge('a', 'd')
-    >>> cluster(g, weights, 0.4)
-    (['a', 'b'], ['c', 'd'])
+    >>> cluster(g, weights, 0.4) == frozenset({frozenset({'a', 'b'}), frozenset({'c', 'd'})})
+    True
 
     # Test a graph with edges of varying weights.
     # The output when run with a level of 0.4 should be:
@@ -45,8 +61,8 @@ def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level:
     >>> g.add_edge('b', 'c')
     >>> g.add_edge('c', 'd')
     >>> g.add_edge('a', 'd')
-    >>> cluster(g, weights, 0.4)
-    (['a', 'b'], ['c', 'd'])
+    >>> cluster(g, weights, 0.4) == frozenset({frozenset({'a', 'b'}), frozenset({'c', 'd'})})
+    True
 
     # Test a graph where all edges have the same weight.
     # The output should be one cluster containing all nodes if the level is less than the weight,
@@ -58,18 +74,18 @@ def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level:
     >>> g.add_edge('b', 'c')
     >>> g.add_edge('c', 'd')
     >>> g.add_edge('a', 'd')
-    >>> cluster(g, weights, 0.5)
-    (['a', 'b', 'c', 'd'])
-    >>> cluster(g, weights, 1.5)
-    (['a'], ['b'], ['c'], ['d'])
+    >>> cluster(g, weights, 0.5) == frozenset({frozenset({'a', 'b', 'c', 'd'})})
+    True
+    >>> cluster(g, weights, 1.5) == frozenset({frozenset({'a'}), frozenset({'b'}), frozenset({'c'}), frozenset({'d'})})
+    True
 
     # Test an empty graph.
-    # The output should be an empty tuple since there are no nodes.
+    # The output should be empty since there are no nodes.
     >>> def weights(x, y):
     ...     return 1
     >>> g = UndirectedGraph()
     >>> cluster(g, weights, 1)
-    ()
+    frozenset()
 
     # Test a graph with one node and no edges.
     # The output should be a single cluster containing the one node, regardless of the level.
@@ -78,7 +94,7 @@ def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level:
     >>> g = UndirectedGraph()
     >>> g.add_node('a')
     >>> cluster(g, weights, 1)
-    (['a'])
+    frozenset({frozenset({'a'})})
 
     # Test a graph with two nodes and an edge between them.
     # The output should be one cluster containing both nodes if the level is less than the weight,
@@ -87,11 +103,31 @@ def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level:
     ...     return 1
     >>> g = UndirectedGraph()
     >>> g.add_edge('a', 'b')
-    >>> cluster(g, weights, 0.5)
-    (['a', 'b'])
-    >>> cluster(g, weights, 1.5)
-    (['a'], ['b'])
+    >>> cluster(g, weights, 0.5) == frozenset({frozenset({'a', 'b'})})
+    True
+    >>> cluster(g, weights, 1.5) == frozenset({frozenset({'a'}), frozenset({'b'})})
+    True
     """
+    if CSRGraph is not None and isinstance(graph, CSRGraph) and graph.weights is not None and weights == graph.weight:
+        # the weights are stored in the graph, so the edges to follow can be
+        # found all at once and the components labeled with whole-array operations
+        if graph.number_of_nodes == 0:
+            return frozenset()
+        components = csr_components(graph, graph.weights >= level)
+        # group the node ids by component with a sort rather than a dict
+        order = np.argsort(components, kind='stable')
+        boundaries = np.flatnonzero(np.diff(components[order])) + 1
+        members = order.tolist()
+        if graph.labels is not None:
+            members = [graph.labels[i] for i in members]
+        starts = [0] + boundaries.tolist()
+        ends = boundaries.tolist() + [len(members)]
+        return frozenset(frozenset(members[start:end]) for start, end in zip(starts, ends))
+
+    instrumented = instrumentation.ENABLED
+    if instrumented:
+        weights = instrumentation.counted(weights, 'cluster.weight_calls')
+
     visited = set()
     clusters = set()
 
@@ -104,8 +140,12 @@ def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level:
                 if current_node not in visited:
                     visited.add(current_node)
                     current_cluster.add(current_node)
-                    for neighbor in graph.neighbors(current_node):
-                        if weights(current_node, neighbor) >= level:
+                    neighbors = graph.neighbors(current_node)
+                    if instrumented:
+                        instrumentation.count('cluster.nodes_visited')
+                        instrumentation.count('cluster.edges_visited', len(neighbors))
+                    for neighbor in neighbors:
+                        if neighbor not in visited and weights(current_node, neighbor) >= level:
                             queue.append(neighbor)
             clusters.add(frozenset(current_cluster))
 
@@ -128,3 +168,74 @@ def cluster(graph: UndirectedGraph, weights: Callable[[Any, Any], float], level:
             clusters.add(frozenset(current_cluster))
 
     return frozenset(clusters)
+
+
+def cluster_levels(graph: UndirectedGraph, weights: Callable[[Any, Any], float], levels: Iterable[float]) -> List[FrozenSet[FrozenSet[Any]]]:
+    """
+    Computes the clusters of a weighted graph at many levels in one pass.
+
+    The edges are weighed once each and sorted by weight, then swept through
+    a disjoint set forest from the highest level down to the lowest, taking
+    a snapshot of the clusters at each level. This takes O(E log E + L V)
+    time for L levels, instead of one traversal per level.
+
+    Parameters
+    ----------
+    graph : UndirectedGraph
+        Graph of type UndirectedGraph from the dsc40graph package, or an
+        undirected csr_graph.CSRGraph.
+    weights : Callable[[Any, Any], float]
+        A function returning the weight of an edge between two nodes.
+    levels : Iterable[float]
+        The levels at which to find the clusters.
+
+    Returns
+    -------
+    clusters : List[FrozenSet[FrozenSet[Any]]]
+        The clusters of the graph at each level, in the same order as `levels`.
+        Each is the same as the result of `cluster(graph, weights, level)`.
+
+    # Doctests
+
+    >>> def weights(x, y):
+    ...     x, y = (x, y) if x < y else (y, x)
+    ...     return {("a", "b"): 1, ("b", "c"): .3, ("c", "d"): .9, ("a", "d"): .2}[(x, y)]
+    >>> g = UndirectedGraph()
+    >>> g.add_edge('a', 'b')
+    >>> g.add_edge('b', 'c')
+    >>> g.add_edge('c', 'd')
+    >>> g.add_edge('a', 'd')
+    >>> profile = cluster_levels(g, weights, [0.4, 1.5, 0.1])
+    >>> profile[0] == frozenset({frozenset({'a', 'b'}), frozenset({'c', 'd'})})
+    True
+    >>> [len(clusters) for clusters in profile]
+    [2, 4, 1]
+    """
+    if instrumentation.ENABLED:
+        weights = instrumentation.counted(weights, 'cluster.weight_calls')
+
+    levels = list(levels)
+    nodes = list(graph.nodes)
+    node_to_id = {node: i for i, node in enumerate(nodes)}
+
+    with instrumentation.phase('cluster_levels.weigh_edges'):
+        edges = [(weights(u, v), node_to_id[u], node_to_id[v]) for u, v in graph.edges]
+    with instrumentation.phase('cluster_levels.sort_edges'):
+        edges.sort(key=itemgetter(0), reverse=True)
+
+    dsf = DisjointSetForest.of_size(len(nodes))
+    results = [None] * len(levels)
+    next_edge = 0
+
+    for i in sorted(range(len(levels)), key=lambda i: levels[i], reverse=True):
+        while next_edge < len(edges) and edges[next_edge][0] >= levels[i]:
+            _, u, v = edges[next_edge]
+            dsf.union(u, v)
+            next_edge += 1
+
+        clusters = {}
+        for node_id, node in enumerate(nodes):
+            clusters.setdefault(dsf.find_set(node_id), set()).add(node)
+        results[i] = frozenset(frozenset(c) for c in clusters.values())
+
+    return results
@@ -0,0 +1,348 @@
+"""
+A compressed sparse row (CSR) graph, and whole-array algorithms on it.
+
+`csr_components` and `csr_two_coloring` find connected components and
+two-colorings by label propagation with pointer jumping (`_min_labels`)
+rather than by a frontier-at-a-time breadth-first search: a search still
+needs a Python step per component, which makes graphs with many small
+components, such as clusterings at high thresholds, slower than a plain
+dict traversal, while label propagation takes O(log n) rounds of array
+operations whatever the components look like.
+"""
+import numpy as np
+from dsc40graph import UndirectedGraph, DirectedGraph
+from typing import Any, Callable, Iterable, Optional
+
+
+class CSRGraph:
+    """
+    A compact graph stored in compressed sparse row (CSR) form.
+
+    Nodes are identified internally by the ids 0..n-1. The neighbors of node
+    i are ``targets[offsets[i]:offsets[i+1]]``, sorted by id, and if the graph
+    is weighted then ``weights`` is parallel to ``targets``. An undirected
+    edge is stored once in each direction (a self loop is stored once). A
+    label table maps ids back to the original node labels; if there is no
+    label table, each node's label is its id.
+
+    CSRGraph has the same `nodes`, `neighbors` and `edges` interface as the
+    graphs of the dsc40graph package, so it can be passed directly to
+    `assign_good_and_evil`, `cluster`, `biggest_descendent` and `slc`. The
+    weights can be passed to those functions as `graph.weight` (for a
+    function of two nodes) or `graph.edge_weight` (for a function of one edge).
+
+    Parameters
+    ----------
+    offsets : array of int
+        of length n + 1, the start of each node's neighbors in `targets`
+    targets : array of int
+        the neighbor ids of every node, concatenated
+    labels : list, optional
+        the label of each node id
+    weights : array of float, optional
+        the weight of each entry in `targets`
+    directed : bool
+        whether the graph is directed
+
+    >>> g = CSRGraph.from_edges(['a', 'a', 'b'], ['b', 'c', 'c'], weights=[1., 4., 2.],
+    ...                         labels=['a', 'b', 'c'])
+    >>> g
+    <CSRGraph with 3 nodes and 3 edges>
+    >>> g.offsets.tolist(), g.targets.tolist()
+    ([0, 2, 4, 6], [1, 2, 0, 2, 0, 1])
+    >>> sorted(g.neighbors('c'))
+    ['a', 'b']
+    >>> g.weight('c', 'b')
+    2.0
+    >>> sorted(g.to_graph().edges) == sorted(g.edges)
+    True
+    """
+
+    def __init__(self, offsets, targets, labels: Optional[list] = None, weights=None, directed: bool = False):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        self.directed = directed
+
+        if len(self.offsets) == 0 or self.offsets[-1] != len(self.targets):
+            raise ValueError('offsets must have n + 1 entries, ending at len(targets).')
+        if self.weights is not None and len(self.weights) != len(self.targets):
+            raise ValueError('weights must be parallel to targets.')
+
+        self.labels = labels
+        if labels is None:
+            self._label_to_id = None
+        else:
+            if len(labels) != len(self.offsets) - 1:
+                raise ValueError('there must be one label per node.')
+            self._label_to_id = {label: i for i, label in enumerate(labels)}
+
+    @classmethod
+    def from_edges(cls, us: Iterable, vs: Iterable, weights=None, labels: Optional[list] = None,
+                   number_of_nodes: Optional[int] = None, directed: bool = False) -> 'CSRGraph':
+        """Builds a CSRGraph from parallel sequences of edge endpoints.
+
+        If `labels` is given, the endpoints are labels from it; otherwise they
+        are ids, and the number of nodes is one more than the largest id
+        unless `number_of_nodes` is given. Each edge should appear once.
+
+        >>> g = CSRGraph.from_edges([0, 1], [1, 2], directed=True)
+        >>> g.neighbors(0), g.neighbors(2)
+        ([1], [])
+        """
+        if labels is not None:
+            label_to_id = {label: i for i, label in enumerate(labels)}
+            us = np.fromiter((label_to_id[u] for u in us), dtype=np.int64)
+            vs = np.fromiter((label_to_id[v] for v in vs), dtype=np.int64)
+            number_of_nodes = len(labels)
+        else:
+            us = np.asarray(us, dtype=np.int64).ravel()
+            vs = np.asarray(vs, dtype=np.int64).ravel()
+            if number_of_nodes is None:
+                number_of_nodes = int(max(us.max(initial=-1), vs.max(initial=-1))) + 1
+
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64).ravel()
+
+        if not directed:
+            # store each edge in both directions, but a self loop only once
+            reverse = us != vs
+            us, vs = np.concatenate([us, vs[reverse]]), np.concatenate([vs, us[reverse]])
+            if weights is not None:
+                weights = np.concatenate([weights, weights[reverse]])
+
+        order = np.lexsort((vs, us))
+        targets = vs[order]
+        counts = np.bincount(us, minlength=number_of_nodes)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        if weights is not None:
+            weights = weights[order]
+
+        return cls(offsets, targets, labels=labels, weights=weights, directed=directed)
+
+    @classmethod
+    def from_graph(cls, graph, weights: Optional[Callable[[Any, Any], float]] = None) -> 'CSRGraph':
+        """Converts an UndirectedGraph or DirectedGraph to a CSRGraph.
+
+        If `weights` is given, it is called once per edge to fill in the
+        weight array.
+
+        >>> g = UndirectedGraph()
+        >>> g.add_edge('a', 'b')
+        >>> g.add_node('c')
+        >>> csr = CSRGraph.from_graph(g, weights=lambda u, v: 3)
+        >>> sorted(csr.labels), csr.weight('b', 'a')
+        (['a', 'b', 'c'], 3.0)
+        """
+        labels = list(graph.nodes)
+        edges = list(graph.edges)
+        us = [u for u, _ in edges]
+        vs = [v for _, v in edges]
+        edge_weights = None if weights is None else [weights(u, v) for u, v in edges]
+        return cls.from_edges(us, vs, weights=edge_weights, labels=labels,
+                              directed=isinstance(graph, DirectedGraph))
+
+    def to_graph(self):
+        """Converts the graph to an UndirectedGraph or DirectedGraph."""
+        graph = DirectedGraph() if self.directed else UndirectedGraph()
+        for node in self.nodes:
+            graph.add_node(node)
+        for u, v in self.edges:
+            graph.add_edge(u, v)
+        return graph
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} with {self.number_of_nodes} nodes and {self.number_of_edges} edges>"
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def number_of_edges(self) -> int:
+        if self.directed:
+            return len(self.targets)
+        return int(np.count_nonzero(self._sources() <= self.targets))
+
+    @property
+    def nodes(self):
+        if self.labels is None:
+            return range(self.number_of_nodes)
+        return self.labels
+
+    @property
+    def edges(self):
+        sources = self._sources()
+        if self.directed:
+            us, vs = sources, self.targets
+        else:
+            keep = sources <= self.targets
+            us, vs = sources[keep], self.targets[keep]
+        for u, v in zip(us.tolist(), vs.tolist()):
+            yield (self.label_of(u), self.label_of(v))
+
+    def id_of(self, label) -> int:
+        """The id of the node with the given label."""
+        if self._label_to_id is None:
+            if not 0 <= label < self.number_of_nodes:
+                raise KeyError(label)
+            return label
+        return self._label_to_id[label]
+
+    def label_of(self, node_id: int):
+        """The label of the node with the given id."""
+        if self.labels is None:
+            return node_id
+        return self.labels[node_id]
+
+    def neighbor_ids(self, node_id: int):
+        """The ids of the neighbors of the node with the given id, as an array."""
+        return self.targets[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def neighbors(self, label) -> list:
+        """The labels of the neighbors of the node with the given label."""
+        ids = self.neighbor_ids(self.id_of(label)).tolist()
+        if self.labels is None:
+            return ids
+        return [self.labels[i] for i in ids]
+
+    def weight(self, u, v) -> float:
+        """The weight of the edge from u to v."""
+        if self.weights is None:
+            raise ValueError('the graph is unweighted.')
+        u_id, v_id = self.id_of(u), self.id_of(v)
+        start, end = self.offsets[u_id], self.offsets[u_id + 1]
+        i = start + np.searchsorted(self.targets[start:end], v_id)
+        if i == end or self.targets[i] != v_id:
+            raise KeyError((u, v))
+        return float(self.weights[i])
+
+    def edge_weight(self, edge) -> float:
+        """The weight of an edge given as a pair (u, v)."""
+        u, v = edge
+        return self.weight(u, v)
+
+    def _sources(self):
+        return np.repeat(np.arange(self.number_of_nodes, dtype=np.int64), np.diff(self.offsets))
+
+
+def _min_labels(offsets, targets):
+    """
+    Labels every node of an undirected graph, given as CSR arrays, with the
+    smallest id in its component.
+
+    Each node starts as its own label, which is treated as a pointer to a
+    parent. Every round, each node hooks itself and its parent onto the
+    smallest grandparent among its neighbors, and then every pointer is
+    shortcut to its grandparent. The labels converge in O(log n) rounds on
+    most graphs, each round a handful of whole-array operations, so the
+    interpreter does work per round rather than per node or per edge.
+    """
+    n = len(offsets) - 1
+    parent = np.arange(n, dtype=np.int64)
+    if len(targets) == 0:
+        return parent
+    sources = np.repeat(parent, np.diff(offsets))
+
+    grandparent = parent.copy()
+    while True:
+        neighbor_grandparents = grandparent[targets]
+        # hook each node's parent, and then the node itself, onto the
+        # smallest grandparent among its neighbors
+        np.minimum.at(parent, parent[sources], neighbor_grandparents)
+        np.minimum.at(parent, sources, neighbor_grandparents)
+        np.minimum(parent, grandparent, out=parent)
+
+        new_grandparent = parent[parent]
+        if np.array_equal(new_grandparent, grandparent):
+            break
+        grandparent = new_grandparent
+
+    while True:
+        new_parent = parent[parent]
+        if np.array_equal(new_parent, parent):
+            return parent
+        parent = new_parent
+
+
+def csr_components(graph: CSRGraph, edge_mask=None):
+    """
+    Labels the connected components of an undirected CSRGraph.
+
+    The components are found by label propagation with pointer jumping
+    (`_min_labels`), which runs in a small number of rounds of whole-array
+    operations, whatever the number of components.
+
+    Parameters
+    ----------
+    graph : CSRGraph
+        an undirected graph
+    edge_mask : array of bool, optional
+        parallel to `graph.targets`; only the edges where it is True are
+        followed. It should be symmetric.
+
+    Returns
+    -------
+    components : array of int
+        the component number of each node id, numbered from 0 in order of
+        their smallest node id
+
+    >>> g = CSRGraph.from_edges([0, 1, 3], [1, 2, 4], weights=[1., .2, 1.])
+    >>> csr_components(g).tolist()
+    [0, 0, 0, 1, 1]
+    >>> csr_components(g, g.weights >= .5).tolist()
+    [0, 0, 1, 2, 2]
+    """
+    offsets, targets = graph.offsets, graph.targets
+    if edge_mask is not None:
+        edge_mask = np.asarray(edge_mask, dtype=bool)
+        targets = targets[edge_mask]
+        kept = np.concatenate([[0], np.cumsum(edge_mask)])
+        offsets = kept[offsets]
+
+    labels = _min_labels(offsets, targets)
+    # each label is the smallest id in its component, so numbering the
+    # distinct labels in order numbers the components by smallest id
+    _, components = np.unique(labels, return_inverse=True)
+    return components.astype(np.int64).ravel()
+
+
+def csr_two_coloring(graph: CSRGraph):
+    """
+    Colors the nodes of an undirected CSRGraph with 0 and 1 so that every
+    edge joins nodes of different colors, if possible.
+
+    The components of the doubled graph are found with `_min_labels`. The
+    doubled graph has an even copy 2v and an odd copy 2v + 1 of each node v,
+    and each edge (u, v) becomes the edges (2u, 2v + 1) and (2u + 1, 2v), so
+    a path between the copies of v is an odd cycle. Otherwise, with s the
+    smallest node in the component of v, 2v is in the component of either
+    2s or 2s + 1. v gets color 0 in the first case and 1 in the second, which
+    is the parity of the label of 2v. The smallest node in each component
+    gets color 0.
+
+    Returns
+    -------
+    colors : array of int, or None
+        the color of each node id, or None if the graph is not bipartite
+
+    >>> csr_two_coloring(CSRGraph.from_edges([0, 1, 3], [1, 2, 4])).tolist()
+    [0, 1, 0, 0, 1]
+    >>> csr_two_coloring(CSRGraph.from_edges([0, 1, 2], [1, 2, 0])) is None
+    True
+    """
+    offsets, targets = graph.offsets, graph.targets
+    degrees = np.diff(offsets)
+    sources = graph._sources()
+    # node 2u lists 2v + 1 for every neighbor v of u, followed by node
+    # 2u + 1 listing 2v, so the doubled graph is in CSR form too
+    doubled_offsets = np.concatenate([[0], np.cumsum(np.repeat(degrees, 2))])
+    positions = 2 * offsets[sources] + (np.arange(len(targets)) - offsets[sources])
+    doubled_targets = np.empty(2 * len(targets), dtype=np.int64)
+    doubled_targets[positions] = 2 * targets + 1
+    doubled_targets[positions + degrees[sources]] = 2 * targets
+
+    labels = _min_labels(doubled_offsets, doubled_targets)
+    if np.any(labels[0::2] == labels[1::2]):
+        return None
+    return (labels[0::2] & 1).astype(np.int8)
@@ -1,8 +1,37 @@
+from array import array
+
+import instrumentation
+
+
 class DisjointSetForest:
+    """A disjoint set forest over the given elements.
 
-    def __init__(self, elements):
-        self._core = _DisjointSetForestCore()
+    `typecode` is the array typecode used to store ids: 'q' for 64-bit
+    integers, or 'i' to halve the memory used with 32-bit integers when
+    there are fewer than 2^31 elements.
+    Example
+    -------
+    >>> dsf = DisjointSetForest.of_size(3, typecode='i')
+    >>> dsf.union(0, 1)
+    >>> dsf.find_set(0) == dsf.find_set(1)
+    True
+    """
+
+    def __init__(self, elements, typecode='q'):
+        if typecode not in ('i', 'q'):
+            raise ValueError("typecode must be 'i' or 'q'.")
+        self._core = self._make_core(typecode)
+
+        # when the elements are exactly the ids 0..n-1, the id mappings are
+        # the identity and are skipped entirely
+        if isinstance(elements, range) and elements.start == 0 and elements.step == 1:
+            self._identity = True
+            self.element_to_id = None
+            self.id_to_element = None
+            self._core.make_sets(len(elements))
+            return
 
+        self._identity = False
         self.element_to_id = {}
         self.id_to_element = {}
 
@@ -11,6 +40,48 @@ class DisjointSetForest:
             self.element_to_id[element] = eid
             self.id_to_element[eid] = element
 
+    def _make_core(self, typecode):
+        return _DisjointSetForestCore(typecode)
+
+    @classmethod
+    def of_size(cls, n, typecode='q'):
+        """Creates a forest over the integers 0..n-1 without the id mappings.
+        Example
+        -------
+        >>> dsf = DisjointSetForest.of_size(3)
+        >>> dsf.union(0, 2)
+        >>> dsf.in_same_set(0, 2)
+        True
+        """
+        return cls(range(n), typecode)
+
+    def make_sets(self, n):
+        """Adds n new singleton sets to a forest over the integers 0..m-1,
+        returning the range of their elements, m..m+n-1.
+        Example
+        -------
+        >>> dsf = DisjointSetForest.of_size(2)
+        >>> dsf.make_sets(3)
+        range(2, 5)
+        >>> dsf.number_of_sets
+        5
+        """
+        if not self._identity:
+            raise ValueError('make_sets needs a forest over the integers 0..n-1.')
+        return self._core.make_sets(n)
+
+    @property
+    def number_of_sets(self):
+        """The number of disjoint sets, maintained in constant time.
+        Example
+        -------
+        >>> dsf = DisjointSetForest(['a', 'b', 'c'])
+        >>> dsf.union('a', 'b')
+        >>> dsf.number_of_sets
+        2
+        """
+        return self._core.number_of_sets
+
     def find_set(self, element):
         """Finds the "representative" of the set containing the element.
         Initially, each element is in its own set, and so it's representative is itself.
@@ -22,12 +93,29 @@ class DisjointSetForest:
         >>> dsf.find_set('a')
         'a'
         """
+        if self._identity:
+            return self._core.find_set(element)
         return self.id_to_element[
                 self._core.find_set(
                     self.element_to_id[element]
                 )
             ]
 
+    def find_many(self, elements):
+        """Finds the representatives of many elements at once.
+        Example
+        -------
+        >>> dsf = DisjointSetForest.of_size(4)
+        >>> dsf.union_many([0, 2], [1, 3])
+        2
+        >>> list(dsf.find_many([0, 1, 2, 3]))
+        [1, 1, 3, 3]
+        """
+        if self._identity:
+            return self._core.find_many(elements)
+        ids = [self.element_to_id[element] for element in elements]
+        return [self.id_to_element[rep] for rep in self._core.find_many(ids)]
+
     def union(self, x, y):
         """Unions the set containing `x` with the set containing `y`.
         Example
@@ -39,10 +127,41 @@ class DisjointSetForest:
         >>> dsf.in_same_set('a', 'b')
         True
         """
+        if self._identity:
+            self._core.union(x, y)
+            return
         x_id = self.element_to_id[x]
         y_id = self.element_to_id[y]
         self._core.union(x_id, y_id)
 
+    def union_many(self, xs, ys):
+        """Unions the set containing xs[i] with the set containing ys[i] for
+        each i, returning the number of unions which merged two sets.
+        Example
+        -------
+        >>> dsf = DisjointSetForest(['a', 'b', 'c'])
+        >>> dsf.union_many(['a', 'b', 'a'], ['b', 'c', 'c'])
+        2
+        """
+        if self._identity:
+            return self._core.union_many(xs, ys)
+        return self._core.union_many(
+            [self.element_to_id[x] for x in xs],
+            [self.element_to_id[y] for y in ys]
+        )
+
+    def size_of_set(self, element):
+        """The number of elements in the set containing the element.
+        Example
+        -------
+        >>> dsf = DisjointSetForest(['a', 'b', 'c'])
+        >>> dsf.union('a', 'b')
+        >>> dsf.size_of_set('b')
+        2
+        """
+        if self._identity:
+            return self._core.size_of_set(element)
+        return self._core.size_of_set(self.element_to_id[element])
 
     def in_same_set(self, x, y):
         """Determines if elements x and y are in the same set.
@@ -58,40 +177,138 @@ class DisjointSetForest:
         return self.find_set(x) == self.find_set(y)
 
 
+class RollbackDisjointSetForest(DisjointSetForest):
+    """A disjoint set forest whose unions can be undone.
+
+    Unions are by rank without path compression, so every find takes
+    O(log n) time, and each union which merges two sets is recorded in an
+    undo log. `checkpoint` marks a point in the log and `rollback` undoes
+    every union made since, in time proportional to the number of unions
+    undone. This makes it cheap to explore many alternative edge sets on
+    top of a shared base forest.
+    Example
+    -------
+    >>> dsf = RollbackDisjointSetForest(['a', 'b', 'c', 'd'])
+    >>> dsf.union('a', 'b')
+    >>> token = dsf.checkpoint()
+    >>> dsf.union('b', 'c')
+    >>> dsf.union('c', 'd')
+    >>> dsf.number_of_sets
+    1
+    >>> dsf.rollback(token)
+    >>> dsf.number_of_sets
+    3
+    >>> dsf.in_same_set('a', 'b'), dsf.in_same_set('b', 'c')
+    (True, False)
+    """
+
+    def _make_core(self, typecode):
+        return _RollbackDisjointSetForestCore(typecode)
+
+    def checkpoint(self):
+        """Returns a token marking the current state of the forest."""
+        return self._core.checkpoint()
+
+    def rollback(self, token):
+        """Undoes every union made since `token` was returned by `checkpoint`."""
+        self._core.rollback(token)
+
+
 class _DisjointSetForestCore:
+    """Union by rank with path compression over the ids 0..n-1.
+
+    The parents, ranks and sizes are stored in typed arrays rather than
+    lists, and a root is its own parent. Ids are stored with the array
+    `typecode`, 'q' or 'i'.
+    """
+
+    def __init__(self, typecode='q'):
+        self._parent = array(typecode)
+        self._rank = array('B')
+        self._size_of_set = array(typecode)
+        self._number_of_sets = 0
 
-    def __init__(self):
-        self._parent = []
-        self._rank = []
-        self._size_of_set = []
+    def __len__(self):
+        return len(self._parent)
+
+    @property
+    def number_of_sets(self):
+        return self._number_of_sets
 
     def make_set(self):
         # get the new element's "id"
         x = len(self._parent)
-        self._parent.append(None)
+        self._parent.append(x)
         self._rank.append(0)
         self._size_of_set.append(1)
+        self._number_of_sets += 1
         return x
 
+    def make_sets(self, n):
+        start = len(self._parent)
+        self._parent.extend(range(start, start + n))
+        self._rank.frombytes(bytes(n))
+        self._size_of_set.extend(array(self._size_of_set.typecode, [1]) * n)
+        self._number_of_sets += n
+        return range(start, start + n)
+
     def find_set(self, x):
-        try:
-            parent = self._parent[x]
-        except IndexError:
+        if instrumentation.ENABLED:
+            return self._find_set_instrumented(x)
+
+        parent = self._parent
+        if x < 0 or x >= len(parent):
             raise ValueError(f'{x} is not in the collection.')
 
-        if self._parent[x] is None:
-            return x
-        else:
-            root = self.find_set(self._parent[x])
-            self._parent[x] = root
-            return root
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+
+        # compress the path so that every node on it points at the root
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+
+        return root
+
+    def _find_set_instrumented(self, x):
+        parent = self._parent
+        if x < 0 or x >= len(parent):
+            raise ValueError(f'{x} is not in the collection.')
+
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+
+        compressed = 0
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+            compressed += 1
+
+        instrumentation.count('dsf.find_set_calls')
+        instrumentation.count('dsf.nodes_compressed', compressed)
+        instrumentation.record_max('dsf.longest_path_compressed', compressed)
+        return root
+
+    def find_many(self, ids):
+        if hasattr(ids, 'tolist'):
+            ids = ids.tolist()
+        find_set = self.find_set
+        return array(self._parent.typecode, [find_set(x) for x in ids])
+
+    def size_of_set(self, x):
+        return self._size_of_set[self.find_set(x)]
 
     def union(self, x, y):
         x_rep = self.find_set(x)
         y_rep = self.find_set(y)
 
         if x_rep == y_rep:
-            return
+            if instrumentation.ENABLED:
+                instrumentation.count('dsf.unions_skipped')
+            return False
+
+        if instrumentation.ENABLED:
+            instrumentation.count('dsf.unions_performed')
 
         if self._rank[x_rep] > self._rank[y_rep]:
             self._parent[y_rep] = x_rep
@@ -100,4 +317,68 @@ class _DisjointSetForestCore:
             self._parent[x_rep] = y_rep
             self._size_of_set[y_rep] += self._size_of_set[x_rep]
             if self._rank[x_rep] == self._rank[y_rep]:
-                self._rank[y_rep] += 1
\ No newline at end of file
+                self._rank[y_rep] += 1
+
+        self._number_of_sets -= 1
+        return True
+
+    def union_many(self, xs, ys):
+        if hasattr(xs, 'tolist'):
+            xs = xs.tolist()
+        if hasattr(ys, 'tolist'):
+            ys = ys.tolist()
+        union = self.union
+        return sum(union(x, y) for x, y in zip(xs, ys))
+
+
+class _RollbackDisjointSetForestCore(_DisjointSetForestCore):
+
+    def __init__(self, typecode='q'):
+        super().__init__(typecode)
+        # each entry is (attached root, new root, whether the new root's rank grew)
+        self._undo_log = []
+
+    def find_set(self, x):
+        parent = self._parent
+        if x < 0 or x >= len(parent):
+            raise ValueError(f'{x} is not in the collection.')
+
+        # no path compression, so that every union can be undone exactly
+        while parent[x] != x:
+            x = parent[x]
+        return x
+
+    def union(self, x, y):
+        x_rep = self.find_set(x)
+        y_rep = self.find_set(y)
+
+        if x_rep == y_rep:
+            return False
+
+        if self._rank[x_rep] > self._rank[y_rep]:
+            x_rep, y_rep = y_rep, x_rep
+
+        rank_grew = self._rank[x_rep] == self._rank[y_rep]
+        self._parent[x_rep] = y_rep
+        self._size_of_set[y_rep] += self._size_of_set[x_rep]
+        if rank_grew:
+            self._rank[y_rep] += 1
+
+        self._undo_log.append((x_rep, y_rep, rank_grew))
+        self._number_of_sets -= 1
+        return True
+
+    def checkpoint(self):
+        return len(self._undo_log)
+
+    def rollback(self, token):
+        if token < 0 or token > len(self._undo_log):
+            raise ValueError(f'{token} is not a valid checkpoint.')
+
+        while len(self._undo_log) > token:
+            x_rep, y_rep, rank_grew = self._undo_log.pop()
+            self._parent[x_rep] = x_rep
+            self._size_of_set[y_rep] -= self._size_of_set[x_rep]
+            if rank_grew:
+                self._rank[y_rep] -= 1
+            self._number_of_sets += 1
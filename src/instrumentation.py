@@ -0,0 +1,92 @@
+"""
+Opt-in counters and timings for the hot paths of the algorithms.
+
+Instrumentation is off unless the environment variable DSC40B_INSTRUMENT is
+set to something other than '' or '0', or code runs inside `instrument()`.
+While it is off, each instrumented function pays for a single check of
+`ENABLED`, made once per call rather than once per step where possible.
+
+>>> from disjoint_set_forest import DisjointSetForest
+>>> with instrument() as stats:
+...     dsf = DisjointSetForest.of_size(3)
+...     dsf.union(0, 1)
+...     dsf.union(1, 0)
+>>> stats()['counters']['dsf.unions_performed'], stats()['counters']['dsf.unions_skipped']
+(1, 1)
+"""
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('DSC40B_INSTRUMENT', '') not in ('', '0')
+
+_counters = Counter()
+_maxima = {}
+_timings = Counter()
+
+
+def count(name, n=1):
+    """Adds n to a counter."""
+    _counters[name] += n
+
+
+def record_max(name, value):
+    """Records a value, keeping the largest seen under that name."""
+    if value > _maxima.get(name, value - 1):
+        _maxima[name] = value
+
+
+def counted(func, name):
+    """Wraps a callable so that each call adds one to a counter."""
+    def wrapper(*args):
+        _counters[name] += 1
+        return func(*args)
+    return wrapper
+
+
+@contextmanager
+def phase(name):
+    """Adds the wall-clock time spent in the block to the phase's timing."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings[name] += time.perf_counter() - start
+
+
+def snapshot():
+    """Returns a copy of the counters, maxima and phase timings (in seconds)."""
+    return {
+        'counters': dict(_counters),
+        'maxima': dict(_maxima),
+        'timings': dict(_timings),
+    }
+
+
+def reset():
+    """Clears every counter, maximum and timing."""
+    _counters.clear()
+    _maxima.clear()
+    _timings.clear()
+
+
+@contextmanager
+def instrument(clear=True):
+    """
+    Turns instrumentation on within the block, clearing the previous
+    results first unless `clear` is False. Yields `snapshot`, which can be
+    called during or after the block.
+    """
+    global ENABLED
+    previous = ENABLED
+    if clear:
+        reset()
+    ENABLED = True
+    try:
+        yield snapshot
+    finally:
+        ENABLED = previous
@@ -1,4 +1,12 @@
 import random
+from bisect import bisect_right
+
+import instrumentation
+
+try:
+    import numpy as np
+except ImportError:  # the batch queries of KnnIndex fall back to a loop
+    np = None
 
 def knn_distance(arr, q, k):
     """
@@ -10,8 +18,11 @@ def knn_distance(arr, q, k):
     k should start at 1, such that knn_distance(arr, q, 1) 
     returns the distance between q and the point in arr closest to q 
 
-    Implementation has an expected time of 
-    Θ(n), where n is the size of the input list
+    Implementation has a worst-case time of 
+    Θ(n), where n is the size of the input list, and does not
+    modify arr. If arr is a NumPy array, np.partition is used.
+    To answer many queries against the same array, use KnnIndex;
+    for points in more than one dimension, use spatial_tree.KDTree.
     
     >>> knn_distance([3, 10, 52, 15], 19, 1)
     (4, 15)
@@ -20,6 +31,14 @@ def knn_distance(arr, q, k):
     >>> knn_distance([3, 10, 52, 15], 19, 3)
     (16, 3)
 
+    Points at the same distance from q are ranked by their position in arr:
+
+    >>> knn_distance([3, 7], 5, 1), knn_distance([3, 7], 5, 2)
+    ((2, 3), (2, 7))
+    >>> import numpy as np
+    >>> knn_distance(np.array([1, 5, 200], dtype=np.uint8), 4, 2)
+    (3, 1)
+
     Parameters
     ----------
     arr : list
@@ -35,35 +54,267 @@ def knn_distance(arr, q, k):
         a target q and the kth closest point to q in array, 
         and the kth closest point itself
     """
+    if not 1 <= k <= len(arr):
+        raise ValueError(f'k must be between 1 and {len(arr)}.')
 
-    def partition(arr, left, right, pivot_index):
-        pivot_distance = abs(arr[pivot_index] - q)
-        arr[pivot_index], arr[right] = arr[right], arr[pivot_index]
-        store_index = left
-        for i in range(left, right):
-            if abs(arr[i] - q) < pivot_distance:
-              arr[store_index], arr[i] = arr[i], arr[store_index]
-              store_index += 1
-        arr[right], arr[store_index] = arr[store_index], arr[right]
-        return store_index
-    
-    def quickselect(arr, left, right, k):
-        if left == right:
-            return arr[left]
-        
-        pivot_index = random.randint(left, right)
-        pivot_index = partition(arr, left, right, pivot_index)
-        if k == pivot_index:
-            return arr[k]
-        elif k < pivot_index:
-            return quickselect(arr, left, pivot_index - 1, k)
+    if np is not None and isinstance(arr, np.ndarray):
+        values = arr
+        if arr.dtype.kind in 'bu' or (arr.dtype.kind == 'i' and arr.dtype.itemsize < 8):
+            # differences of small or unsigned integers would wrap around
+            values = arr.astype(np.float64 if arr.dtype == np.uint64 else np.int64)
+        distances = np.abs(values - q)
+        distance = np.partition(distances, k - 1)[k - 1]
+        smaller = np.count_nonzero(distances < distance)
+        i = np.flatnonzero(distances == distance)[k - 1 - smaller]
+        return (distances[i].item(), arr[i].item())
+
+    # compute each distance once; the selection works on this list, so
+    # the caller's array is left untouched
+    distances = [abs(x - q) for x in arr]
+    distance = _select(distances, k - 1)
+    # points at the same distance are ranked by their position in arr
+    skip = k - 1 - sum(1 for x_distance in distances if x_distance < distance)
+    for x, x_distance in zip(arr, distances):
+        if x_distance == distance:
+            if skip == 0:
+                return (distance, x)
+            skip -= 1
+
+
+def _select(values, k):
+    """Returns the kth smallest (from 0) of the values, leaving them unchanged.
+
+    Random pivots are used while they keep paying off: if two rounds of
+    partitioning fail to halve the number of candidates, the pivots are
+    chosen by the median of medians from then on, which bounds the worst
+    case at Θ(n). Partitioning is three-way, so values equal to the pivot
+    are settled in one round no matter how many duplicates there are.
+    """
+    instrumented = instrumentation.ENABLED
+    use_median_of_medians = False
+    rounds = 0
+    size_two_rounds_ago = len(values)
+
+    while True:
+        if len(values) <= 5:
+            if instrumented:
+                instrumentation.record_max('knn_distance.select_rounds', rounds)
+            return sorted(values)[k]
+
+        if use_median_of_medians:
+            pivot = _median_of_medians(values)
         else:
-            return quickselect(arr, pivot_index + 1, right, k)
-
-    kth_closest = quickselect(arr, 0, len(arr) - 1, k - 1)
-    distance = abs(kth_closest - q)
-    return (distance, kth_closest)
-  
-print(knn_distance([3, 10, 52, 15], 19, 1))
-print(knn_distance([3, 10, 52, 15,], 19, 2))
-print(knn_distance([3, 10, 52, 15], 19, 3))
+            pivot = random.choice(values)
+
+        if instrumented:
+            instrumentation.count('knn_distance.partition_passes')
+            instrumentation.count('knn_distance.values_partitioned', len(values))
+            if use_median_of_medians:
+                instrumentation.count('knn_distance.median_of_medians_pivots')
+
+        smaller = [v for v in values if v < pivot]
+        larger = [v for v in values if v > pivot]
+        number_equal = len(values) - len(smaller) - len(larger)
+
+        if k < len(smaller):
+            values = smaller
+        elif k < len(smaller) + number_equal:
+            if instrumented:
+                instrumentation.record_max('knn_distance.select_rounds', rounds + 1)
+            return pivot
+        else:
+            k -= len(smaller) + number_equal
+            values = larger
+
+        rounds += 1
+        if rounds % 2 == 0:
+            if len(values) > size_two_rounds_ago // 2:
+                use_median_of_medians = True
+            size_two_rounds_ago = len(values)
+
+
+def _median_of_medians(values):
+    medians = [
+        sorted(values[i:i + 5])[(min(5, len(values) - i) - 1) // 2]
+        for i in range(0, len(values), 5)
+    ]
+    return _select(medians, (len(medians) - 1) // 2)
+
+
+class KnnIndex:
+    """
+    An index over an array of numbers for answering many kth closest
+    point queries.
+
+    The array is sorted once, in Θ(n log n) time. The k closest points to
+    any q then form a contiguous window of the sorted array, and the start
+    of that window is found by binary search, so each query takes
+    Θ(log n) time and the input array is never modified. Points at the
+    same distance from q are ranked by their position in arr, as in
+    `knn_distance`, so the index always gives the same answers.
+
+    Parameters
+    ----------
+    arr : list or numpy array
+        input array
+
+    >>> index = KnnIndex([3, 10, 52, 15])
+    >>> index.knn_distance(19, 1)
+    (4, 15)
+    >>> index.knn_distance(19, 2)
+    (9, 10)
+    >>> index.knn_distance(19, 3)
+    (16, 3)
+    >>> distances, points = index.knn_distance_many([19, 19, 0], [1, 3, 2])
+    >>> distances.tolist(), points.tolist()
+    ([4, 16, 10], [15, 3, 10])
+    >>> tied = KnnIndex([3, 7])
+    >>> tied.knn_distance(5, 1), tied.knn_distance(5, 2)
+    ((2, 3), (2, 7))
+    >>> KnnIndex(np.array([5, 9], dtype=np.uint8)).knn_distance(0, 1)
+    (5, 5)
+    """
+
+    def __init__(self, arr):
+        if np is not None and isinstance(arr, np.ndarray):
+            arr = arr.ravel()
+            values = arr
+            if arr.dtype.kind in 'bu' or (arr.dtype.kind == 'i' and arr.dtype.itemsize < 8):
+                # differences of small or unsigned integers would wrap around
+                values = arr.astype(np.float64 if arr.dtype == np.uint64 else np.int64)
+            order = np.argsort(values, kind='stable')
+            self._sorted = values[order]
+            self._positions = order
+            self.points = arr[order].tolist()
+            self._position_list = order.tolist()
+            return
+
+        # a stable sort keeps equal points in order of their position
+        self._position_list = sorted(range(len(arr)), key=arr.__getitem__)
+        self.points = [arr[i] for i in self._position_list]
+        if np is None:
+            self._sorted = self._positions = None
+        else:
+            self._sorted = np.asarray(self.points)
+            self._positions = np.asarray(self._position_list, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.points)
+
+    def knn_distance(self, q, k):
+        """Returns the distance between q and the kth closest point to q,
+        along with the kth closest point itself."""
+        points = self.points
+        n = len(points)
+        if not 1 <= k <= n:
+            raise ValueError(f'k must be between 1 and {n}.')
+
+        # find the leftmost window of k points that is at least as close to
+        # q as the window one to its right
+        left, right = 0, n - k
+        while left < right:
+            middle = (left + right) // 2
+            if q - points[middle] > points[middle + k] - q:
+                left = middle + 1
+            else:
+                right = middle
+
+        # the kth closest distance is that of whichever end of the window
+        # is farther; the points at that distance form a run on each side of q
+        distance = max(q - points[left], points[left + k - 1] - q)
+        split = bisect_right(points, q)
+        below_start = _first(0, split, lambda i: q - points[i] <= distance)
+        below_end = _first(below_start, split, lambda i: q - points[i] < distance)
+        above_start = _first(split, n, lambda i: points[i] - q >= distance)
+        above_end = _first(above_start, n, lambda i: points[i] - q > distance)
+
+        # rank the tied points by position, skipping those which are closer
+        rank = k - (split - below_end) - (above_start - split)
+        positions = self._position_list
+        below_length = below_end - below_start
+        above_length = above_end - above_start
+
+        # take t of the first `rank` tied positions from below and the rest from above
+        t = _first(
+            max(0, rank - above_length), min(rank, below_length),
+            lambda t: positions[below_start + t] > positions[above_start + rank - t - 1]
+        )
+        if t > 0 and (t == rank or positions[below_start + t - 1] > positions[above_start + rank - t - 1]):
+            return (distance, points[below_start])
+        return (distance, points[above_start])
+
+    def knn_distance_many(self, qs, ks):
+        """Answers a batch of queries, where `ks` is either an array
+        parallel to `qs` or a single k for every query.
+
+        Returns an array of the distances and an array of the kth closest
+        points, each parallel to `qs`. With NumPy, every binary search is
+        advanced at once, so the batch takes Θ(m log n) array operations
+        in total for m queries.
+        """
+        if np is None:
+            if not hasattr(ks, '__len__'):
+                ks = [ks] * len(qs)
+            results = [self.knn_distance(q, k) for q, k in zip(qs, ks)]
+            return [d for d, _ in results], [p for _, p in results]
+
+        points = self._sorted
+        positions = self._positions
+        n = len(points)
+        qs = np.asarray(qs)
+        ks = np.broadcast_to(np.asarray(ks, dtype=np.int64), qs.shape)
+        if qs.size and (ks.min() < 1 or ks.max() > n):
+            raise ValueError(f'k must be between 1 and {n}.')
+
+        def at(array, i):
+            return array[np.clip(i, 0, n - 1)]
+
+        start = np.zeros(qs.shape, dtype=np.int64)
+        end = np.full(qs.shape, n, dtype=np.int64)
+        left = _first_many(start, n - ks, lambda i: ~(qs - at(points, i) > at(points, i + ks) - qs))
+
+        distances = np.maximum(qs - points[left], points[left + ks - 1] - qs)
+        split = np.searchsorted(points, qs, side='right')
+        below_start = _first_many(start, split, lambda i: qs - at(points, i) <= distances)
+        below_end = _first_many(below_start, split, lambda i: qs - at(points, i) < distances)
+        above_start = _first_many(split, end, lambda i: at(points, i) - qs >= distances)
+        above_end = _first_many(above_start, end, lambda i: at(points, i) - qs > distances)
+
+        rank = ks - (split - below_end) - (above_start - split)
+        below_length = below_end - below_start
+        above_length = above_end - above_start
+        t = _first_many(
+            np.maximum(0, rank - above_length), np.minimum(rank, below_length),
+            lambda t: at(positions, below_start + t) > at(positions, above_start + rank - t - 1)
+        )
+        from_below = (t > 0) & (
+            (t == rank) | (at(positions, below_start + t - 1) > at(positions, above_start + rank - t - 1))
+        )
+        kth_closest = np.where(from_below, at(points, below_start), at(points, above_start))
+        return distances, kth_closest
+
+
+def _first(low, high, predicate):
+    """The first i in [low, high) for which predicate(i) holds, or high,
+    where predicate is False and then True."""
+    while low < high:
+        middle = (low + high) // 2
+        if predicate(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def _first_many(low, high, predicate):
+    """`_first` for arrays of ranges, advancing every binary search at once."""
+    low = np.array(low, dtype=np.int64)
+    high = np.array(high, dtype=np.int64)
+    active = low < high
+    while active.any():
+        middle = (low + high) // 2
+        holds = predicate(middle)
+        high = np.where(active & holds, middle, high)
+        low = np.where(active & ~holds, middle + 1, low)
+        active = low < high
+    return low
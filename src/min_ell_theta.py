@@ -1,3 +1,13 @@
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:  # fit_threshold sorts with the built-in sorted instead
+    np = None
+
+
 def learn_theta(data, colors):
     """
     Finds the threshold that separates blue and red points. 
@@ -106,6 +116,49 @@ def compute_ell(data, colors, theta):
     return num_red_less_than_theta + num_blue_greater_than_theta
 
 
+def loss_curve(data, colors, thetas):
+    """
+    Computes the loss function L(θ) at many thresholds at once.
+
+    The data is sorted once and the cumulative counts of red and blue
+    points are built, so that the number of points ≤ θ for every θ can be
+    found with a single np.searchsorted. This takes Θ((n + m) log n) time
+    for m thresholds, rather than Θ(nm) for m calls to compute_ell.
+
+    Parameters
+    ----------
+    data : list or numpy array
+        of input nums
+    colors : list or numpy array
+        of strings that gives the color of each point i in data
+    thetas : list or numpy array
+        thresholds for loss
+
+    Returns
+    -------
+    losses : numpy array
+        the loss at each threshold, aligned with thetas
+
+    >>> loss_curve([1.5, 2.5, 3.5, 4.5], ['blue', 'blue', 'red', 'red'], [3, 2.0, 1.0, 5.0, 2.5])
+    array([0, 1, 2, 2, 0])
+    """
+    if np is None:
+        raise ImportError('loss_curve requires NumPy.')
+
+    data = np.asarray(data)
+    is_red = np.asarray(colors) == 'red'
+    order = np.argsort(data, kind='stable')
+    data = data[order]
+    is_red = is_red[order]
+
+    # the number of red and of blue points among the first i sorted points
+    red_le = np.concatenate([[0], np.cumsum(is_red)])
+    blue_le = np.concatenate([[0], np.cumsum(~is_red)])
+
+    number_le = np.searchsorted(data, np.asarray(thetas), side='right')
+    return red_le[number_le] + (blue_le[-1] - blue_le[number_le])
+
+
 def minimize_ell(data, colors):
     """
     Returns a floating-point number which minimizes the loss L for the particular dataset.
@@ -124,16 +177,187 @@ def minimize_ell(data, colors):
 
     >>> minimize_ell([1, 2, 3, 4, 5, 6, 7], ['blue', 'blue', 'blue', 'red', 'red', 'red', 'red'])
     3.5
+
+    # The data does not need to be sorted
+    >>> minimize_ell([7, 1, 5, 3, 6, 2, 4], ['red', 'blue', 'red', 'blue', 'red', 'blue', 'red'])
+    3.5
     """
-    min_loss = float('inf')
+    return fit_threshold(data, colors)[0]
+
+
+def fit_threshold(data, colors, presorted=False):
+    """
+    Finds the threshold which minimizes the loss L, along with the loss.
+
+    The data is sorted once, and then the counts of red points ≤ θ and of
+    blue points > θ are updated in a single sweep over the candidate
+    thresholds, which are the midpoints between consecutive distinct
+    values. This takes Θ(n log n) time, or Θ(n) if the data is already
+    sorted. NumPy arrays are sorted with np.argsort and swept with
+    cumulative sums.
+
+    Parameters
+    ----------
+    data : list or numpy array
+        of real numbers
+    colors : list
+        with each color corresponding to the respective data point
+    presorted : bool
+        whether the data is already sorted in ascending order
+
+    Returns
+    -------
+    tuple : containing the threshold with the smallest loss (the smallest
+        such threshold if there are several) and its loss, or (None, None)
+        if there are fewer than two distinct values
+
+    >>> fit_threshold([4, 1, 3, 2], ['red', 'blue', 'red', 'blue'])
+    (2.5, 0)
+    >>> fit_threshold([1, 2, 2, 3], ['blue', 'blue', 'red', 'red'], presorted=True)
+    (1.5, 1)
+    """
+    if np is not None and isinstance(data, np.ndarray):
+        return _fit_threshold_vectorized(data, np.asarray(colors), presorted)
+
+    if presorted:
+        order = range(len(data))
+    else:
+        order = sorted(range(len(data)), key=data.__getitem__)
+
+    blue_gt_theta = sum(1 for color in colors if color == 'blue')
+    red_le_theta = 0
+
+    min_loss = None
     min_theta = None
-    for i in range(len(data) - 1):
-        theta = (data[i] + data[i+1]) / 2
-        loss = compute_ell(data, colors, theta)
-        if loss < min_loss:
-            min_loss = loss
-            min_theta = theta
-    return min_theta
+    previous = None
+    for i in order:
+        if previous is not None and data[i] != data[previous]:
+            # every point up to and including `previous` is below this threshold
+            loss = red_le_theta + blue_gt_theta
+            if min_loss is None or loss < min_loss:
+                min_loss = loss
+                min_theta = (data[previous] + data[i]) / 2
+
+        if colors[i] == 'red':
+            red_le_theta += 1
+        else:
+            blue_gt_theta -= 1
+        previous = i
+
+    return (min_theta, min_loss)
+
+
+def _fit_threshold_vectorized(data, colors, presorted):
+    if not presorted:
+        order = np.argsort(data, kind='stable')
+        data = data[order]
+        colors = colors[order]
+
+    # the candidate thresholds lie after each position where the value changes
+    boundaries = np.flatnonzero(data[1:] != data[:-1])
+    if len(boundaries) == 0:
+        return (None, None)
+
+    is_red = colors == 'red'
+    red_le = np.cumsum(is_red)[boundaries]
+    blue_le = np.cumsum(~is_red)[boundaries]
+    losses = red_le + (len(data) - is_red.sum()) - blue_le
+
+    best = np.argmin(losses)
+    b = boundaries[best]
+    return (((data[b] + data[b + 1]) / 2).item(), losses[best].item())
+
+
+def fit_stump(X, colors, sample_weight=None, max_workers=None, executor='thread'):
+    """
+    Finds the best decision stump over the columns of a data matrix: the
+    feature, threshold and direction which minimize the (weighted) loss.
+
+    Each column is fit with the same sorted sweep as fit_threshold, in both
+    directions: direction 1 predicts blue for values ≤ θ and red above,
+    and direction -1 predicts the reverse. The columns are distributed over
+    a pool of threads (NumPy releases the GIL while sorting) or processes.
+
+    Parameters
+    ----------
+    X : numpy array
+        of shape (n, d), one row per point and one column per feature
+    colors : list or numpy array
+        with each color corresponding to the respective row of X
+    sample_weight : numpy array, optional
+        the weight of each point in the loss; by default, every point has
+        weight 1
+    max_workers : int, optional
+        the size of the pool
+    executor : str
+        'thread' or 'process'
+
+    Returns
+    -------
+    tuple : containing the feature (column index), the threshold, the
+        direction, and the loss of the best stump. Ties go to the smallest
+        feature, then the smallest threshold, then direction 1. If no
+        column has two distinct values, (None, None, None, None).
+
+    >>> X = np.array([[1., 9.], [2., 1.], [3., 8.], [4., 2.]])
+    >>> fit_stump(X, ['blue', 'red', 'blue', 'red'])
+    (1, 5.0, -1, 0)
+
+    # Weighting the last point makes misclassifying it too costly
+    >>> X = np.array([[1., 3.], [1., 4.], [5., 4.], [1., 3.]])
+    >>> colors = ['blue', 'blue', 'red', 'red']
+    >>> fit_stump(X, colors)
+    (0, 3.0, 1, 1)
+    >>> fit_stump(X, colors, sample_weight=np.array([1, 1, 1, 3]))
+    (1, 3.5, -1, 2)
+    """
+    if np is None:
+        raise ImportError('fit_stump requires NumPy.')
+
+    X = np.asarray(X)
+    is_red = np.asarray(colors) == 'red'
+    if sample_weight is None:
+        weights = np.ones(len(X), dtype=np.int64)
+    else:
+        weights = np.asarray(sample_weight)
+
+    pool = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}[executor]
+    with pool(max_workers=max_workers) as workers:
+        fits = list(workers.map(_fit_column, X.T, repeat(is_red), repeat(weights)))
+
+    best = (None, None, None, None)
+    for feature, fit in enumerate(fits):
+        if fit is not None and (best[0] is None or fit[0] < best[3]):
+            loss, theta, direction = fit
+            best = (feature, theta, direction, loss)
+    return best
+
+
+def _fit_column(column, is_red, weights):
+    """Returns (loss, theta, direction) of the best stump on one column, or
+    None if the column has fewer than two distinct values."""
+    order = np.argsort(column, kind='stable')
+    column = column[order]
+    red_weights = np.where(is_red[order], weights[order], 0)
+    blue_weights = weights[order] - red_weights
+
+    boundaries = np.flatnonzero(column[1:] != column[:-1])
+    if len(boundaries) == 0:
+        return None
+
+    red_le = np.cumsum(red_weights)[boundaries]
+    blue_le = np.cumsum(blue_weights)[boundaries]
+    red_total = red_weights.sum()
+    blue_total = blue_weights.sum()
+
+    best = None
+    for direction, losses in ((1, red_le + blue_total - blue_le), (-1, blue_le + red_total - red_le)):
+        i = np.argmin(losses)
+        b = boundaries[i]
+        fit = (losses[i].item(), ((column[b] + column[b + 1]) / 2).item(), direction)
+        if best is None or fit[0] < best[0] or (fit[0] == best[0] and fit[1] < best[1]):
+            best = fit
+    return best
 
 
 def minimize_ell_sorted(data, colors):
@@ -177,19 +401,18 @@ def minimize_ell_sorted(data, colors):
     min_theta = None
 
     # number of 'blue' points greater than current data point
-    blue_gt_theta = len(data) / 2
+    blue_gt_theta = sum(1 for color in colors if color == 'blue')
 
     # number of 'red' points less than or equal to current data point
     red_le_theta = 0
 
     for i, color in enumerate(colors):
-        if i > 0:
-            # If the current data point is red, increase red_le_theta
-            if color == 'red':
-                red_le_theta += 1
-            # If the current data point is blue, decrease blue_gt_theta
-            else:
-                blue_gt_theta -= 1
+        # If the current data point is red, increase red_le_theta
+        if color == 'red':
+            red_le_theta += 1
+        # If the current data point is blue, decrease blue_gt_theta
+        else:
+            blue_gt_theta -= 1
 
         loss = red_le_theta + blue_gt_theta
 
@@ -197,4 +420,189 @@ def minimize_ell_sorted(data, colors):
             min_loss = loss
             min_theta = data[i]
 
-    return min_theta
\ No newline at end of file
+    return min_theta
+
+
+class OnlineThresholdLearner:
+    """
+    Maintains the threshold which minimizes the loss L as points are added
+    and removed, such as over a sliding window.
+
+    The distinct values are kept in a treap (a randomized balanced binary
+    search tree) along with how many red and blue points have each value.
+    Every node also stores, for its subtree, the prefix of its values which
+    minimizes the number of red points minus the number of blue points; the
+    loss of putting θ just after a prefix is that difference plus the total
+    number of blue points. So `add` and `remove` take expected Θ(log n)
+    time, and `best_theta` reads the best prefix off the root.
+
+    The candidate thresholds are the same as in fit_threshold: midpoints
+    between consecutive distinct values, with ties going to the smallest.
+
+    >>> learner = OnlineThresholdLearner()
+    >>> for x, color in [(4, 'red'), (1, 'blue'), (3, 'red'), (2, 'blue')]:
+    ...     learner.add(x, color)
+    >>> learner.best_theta()
+    (2.5, 0)
+    >>> learner.add(5, 'blue')
+    >>> learner.best_theta()
+    (2.5, 1)
+    >>> learner.remove(1, 'blue')
+    >>> learner.remove(2, 'blue')
+    >>> learner.best_theta()
+    (3.5, 2)
+    """
+
+    def __init__(self):
+        self._root = None
+        self._number_of_points = 0
+        self._number_of_blue = 0
+
+    def __len__(self):
+        return self._number_of_points
+
+    def add(self, x, color):
+        """Adds a point with the given value and color."""
+        is_red = color == 'red'
+        self._root = self._insert(self._root, x, int(is_red), int(not is_red))
+        self._number_of_points += 1
+        self._number_of_blue += not is_red
+
+    def remove(self, x, color):
+        """Removes a point with the given value and color."""
+        is_red = color == 'red'
+        self._root = self._remove(self._root, x, int(is_red), int(not is_red))
+        self._number_of_points -= 1
+        self._number_of_blue -= not is_red
+
+    def best_theta(self):
+        """Returns the threshold with the smallest loss and its loss, or
+        (None, None) if there are fewer than two distinct values."""
+        if self._root is None or self._root.min_before_last is None:
+            return (None, None)
+
+        key = self._root.key_before_last
+        # the threshold lies between the best prefix's last value and the next value
+        successor = None
+        node = self._root
+        while node is not None:
+            if node.key > key:
+                successor = node.key
+                node = node.left
+            else:
+                node = node.right
+
+        return ((key + successor) / 2, self._number_of_blue + self._root.min_before_last)
+
+    def _insert(self, node, key, red, blue):
+        if node is None:
+            node = _TreapNode(key)
+
+        if key < node.key:
+            node.left = self._insert(node.left, key, red, blue)
+            if node.left.priority > node.priority:
+                return self._rotate_right(node)
+        elif key > node.key:
+            node.right = self._insert(node.right, key, red, blue)
+            if node.right.priority > node.priority:
+                return self._rotate_left(node)
+        else:
+            node.red += red
+            node.blue += blue
+
+        node.update()
+        return node
+
+    def _remove(self, node, key, red, blue):
+        if node is None:
+            raise ValueError(f'{key} is not in the learner.')
+
+        if key < node.key:
+            node.left = self._remove(node.left, key, red, blue)
+        elif key > node.key:
+            node.right = self._remove(node.right, key, red, blue)
+        else:
+            if node.red < red or node.blue < blue:
+                raise ValueError(f'{key} is not in the learner with that color.')
+            node.red -= red
+            node.blue -= blue
+            if node.red == 0 and node.blue == 0:
+                return self._delete(node)
+
+        node.update()
+        return node
+
+    def _delete(self, node):
+        # rotate the node down until it has at most one child, then splice it out
+        if node.left is None:
+            return node.right
+        if node.right is None:
+            return node.left
+        if node.left.priority > node.right.priority:
+            node = self._rotate_right(node)
+            node.right = self._delete(node.right)
+        else:
+            node = self._rotate_left(node)
+            node.left = self._delete(node.left)
+        node.update()
+        return node
+
+    @staticmethod
+    def _rotate_right(node):
+        child = node.left
+        node.left = child.right
+        child.right = node
+        node.update()
+        child.update()
+        return child
+
+    @staticmethod
+    def _rotate_left(node):
+        child = node.right
+        node.right = child.left
+        child.left = node
+        node.update()
+        child.update()
+        return child
+
+
+class _TreapNode:
+    __slots__ = (
+        'key', 'red', 'blue', 'priority', 'left', 'right', 'total',
+        'min_prefix', 'key_of_min_prefix', 'min_before_last', 'key_before_last',
+    )
+
+    def __init__(self, key):
+        self.key = key
+        self.red = 0
+        self.blue = 0
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+    def update(self):
+        """Recomputes the subtree aggregates from the children: the sum of
+        red minus blue, the best prefix ending at any value, and the best
+        prefix ending at any value but the largest. Ties go to the shorter
+        prefix."""
+        left, right = self.left, self.right
+        before = 0 if left is None else left.total
+        here = before + self.red - self.blue
+        self.total = here + (0 if right is None else right.total)
+
+        best, best_key = (None, None) if left is None else (left.min_prefix, left.key_of_min_prefix)
+        before_last, before_last_key = best, best_key
+
+        if best is None or here < best:
+            best, best_key = here, self.key
+
+        if right is not None:
+            before_last, before_last_key = best, best_key
+            if right.min_before_last is not None and here + right.min_before_last < before_last:
+                before_last, before_last_key = here + right.min_before_last, right.key_before_last
+            if here + right.min_prefix < best:
+                best, best_key = here + right.min_prefix, right.key_of_min_prefix
+
+        self.min_prefix, self.key_of_min_prefix = best, best_key
+        self.min_before_last, self.key_before_last = before_last, before_last_key
+
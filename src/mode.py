@@ -1,8 +1,22 @@
+import heapq
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count as _count, islice
+
+try:
+    import numpy as np
+except ImportError:  # array_mode and sharded_mode fall back to mode
+    np = None
+
+
 def mode(numbers):
     """
     Given an array of numbers, calculates the mode 
     in O(n) average time complexity
 
+    For streams with too many distinct values to count exactly,
+    see streaming_mode.
+
     Parameters
     ----------
     numbers : list
@@ -30,4 +44,295 @@ def mode(numbers):
             max_frequency = frequency_dict[number]
             mode = number
 
-    return mode
\ No newline at end of file
+    return mode
+
+
+class SpaceSaving:
+    """
+    A bounded-memory summary of the most frequent items in a stream, using
+    the Space-Saving algorithm.
+
+    At most `capacity` items are tracked. When a new item arrives and the
+    summary is full, the item with the smallest count is evicted and the new
+    item inherits its count, which is recorded as the new item's error. The
+    count of every tracked item then overestimates its true frequency by at
+    most its error, which is at most ``total / capacity``; so any item
+    occurring more than ``total / capacity`` times is guaranteed to be
+    tracked. Summaries of separate shards can be combined with `merge`.
+
+    Parameters
+    ----------
+    capacity : int
+        the number of items to track
+
+    >>> summary = SpaceSaving(capacity=2)
+    >>> summary.update_many([1, 2, 1, 3, 1])
+    >>> summary.top()
+    [(1, 3, 0), (3, 2, 1)]
+    >>> summary.mode(), summary.error_bound
+    (1, 2.5)
+    >>> other = SpaceSaving(capacity=2)
+    >>> other.update_many([3, 3, 3])
+    >>> summary.merge(other).top()
+    [(3, 5, 1), (1, 3, 0)]
+    """
+
+    def __init__(self, capacity: int = 1024):
+        if capacity < 1:
+            raise ValueError('capacity must be a positive integer.')
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # a min-heap of (count, tiebreaker, item); entries whose count is out
+        # of date are skipped when popped, and the heap is rebuilt when
+        # too many of them pile up
+        self._heap = []
+        self._tiebreaker = _count()
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def error_bound(self) -> float:
+        """The most by which any tracked count can exceed the true count."""
+        return self.total / self.capacity
+
+    def update(self, item, count: int = 1):
+        """Records `count` more occurrences of the item."""
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            smallest_count, smallest = self._pop_smallest()
+            del self.counts[smallest]
+            del self.errors[smallest]
+            self.counts[item] = smallest_count + count
+            self.errors[item] = smallest_count
+        self._push(item)
+
+    def update_many(self, items, chunk_size: int = 1 << 16):
+        """Records every item in an iterable, which may be a whole stream.
+        The items are tallied `chunk_size` at a time, so that repeated items
+        in a chunk cost one update while memory stays bounded by the chunk
+        size and the capacity."""
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer.')
+        iterator = iter(items)
+        while True:
+            chunk = Counter(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            for item, count in chunk.items():
+                self.update(item, count)
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        """Returns a summary of both streams, with this summary's capacity.
+
+        An item missing from a full summary may have occurred up to that
+        summary's smallest count times, so that is added to its count and
+        error.
+        """
+        merged = SpaceSaving(self.capacity)
+        merged.total = self.total + other.total
+        self_floor = self._floor()
+        other_floor = other._floor()
+
+        candidates = []
+        for item in list(self.counts) + [item for item in other.counts if item not in self.counts]:
+            candidates.append((
+                self.counts.get(item, self_floor) + other.counts.get(item, other_floor),
+                self.errors.get(item, self_floor) + other.errors.get(item, other_floor),
+                item
+            ))
+
+        for count, error, item in heapq.nlargest(self.capacity, candidates, key=lambda c: c[0]):
+            merged.counts[item] = count
+            merged.errors[item] = error
+            merged._push(item)
+        return merged
+
+    def top(self, k: int = None):
+        """Returns up to k tracked items as (item, count, error) tuples,
+        most frequent first."""
+        items = sorted(self.counts, key=lambda item: -self.counts[item])
+        if k is not None:
+            items = items[:k]
+        return [(item, self.counts[item], self.errors[item]) for item in items]
+
+    def mode(self):
+        """Returns the item with the largest count, which is the mode if
+        the mode occurs more than `error_bound` times more than any other
+        item."""
+        if not self.counts:
+            raise ValueError("The stream should not be empty")
+        return max(self.counts, key=self.counts.__getitem__)
+
+    def _floor(self):
+        if len(self.counts) < self.capacity:
+            return 0
+        return self._peek_smallest()[0]
+
+    def _push(self, item):
+        heapq.heappush(self._heap, (self.counts[item], next(self._tiebreaker), item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, next(self._tiebreaker), item) for item, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _peek_smallest(self):
+        while True:
+            count, _, item = self._heap[0]
+            if self.counts.get(item) == count:
+                return count, item
+            heapq.heappop(self._heap)
+
+    def _pop_smallest(self):
+        count, item = self._peek_smallest()
+        heapq.heappop(self._heap)
+        return count, item
+
+
+def streaming_mode(stream, capacity: int = 1024, chunked: bool = False):
+    """
+    Estimates the mode of a stream in memory bounded by `capacity`.
+
+    Parameters
+    ----------
+    stream : iterable
+        of numbers, or of chunks of numbers if `chunked` is True
+    capacity : int
+        the number of distinct values to track
+    chunked : bool
+        whether each element of the stream is itself an iterable of values
+
+    Returns
+    -------
+    mode : int/float
+        the most frequent value in the stream, exactly if it occurs more
+        than len(stream) / capacity times more often than any other value
+
+    >>> streaming_mode(iter([4, 1, 4, 2, 4, 3]), capacity=2)
+    4
+    >>> streaming_mode(([4, 1], [4, 2], [4, 3]), capacity=2, chunked=True)
+    4
+    """
+    summary = SpaceSaving(capacity)
+    if chunked:
+        for chunk in stream:
+            summary.update_many(chunk)
+    else:
+        for item in stream:
+            summary.update(item)
+    return summary.mode()
+
+
+def array_mode(numbers):
+    """
+    Calculates the mode of a large array of numbers with vectorized counting.
+
+    Integers spanning a small range are counted with np.bincount, and
+    anything else with np.unique. Ties are broken as in `mode`: of the values
+    with the largest count, the one which reached that count first wins.
+
+    Parameters
+    ----------
+    numbers : list or numpy array
+        array of nums
+
+    Returns
+    -------
+    mode : int/float
+        the mode of numbers
+
+    >>> array_mode([3, 1, 3, 1, 2])
+    3
+    >>> array_mode([1.5, 2.5, 2.5, 1.5])
+    2.5
+    >>> array_mode(np.array([True, False, True]))
+    True
+    """
+    if np is None:
+        return mode(numbers)
+
+    numbers = np.asarray(numbers).ravel()
+    if numbers.size == 0:
+        raise ValueError("The input array should not be empty")
+
+    values, counts = _count_values(numbers)
+    return _first_to_reach_max(numbers, values, counts)
+
+
+def sharded_mode(numbers, chunk_size: int = 1 << 22, max_workers: int = None):
+    """
+    Calculates the mode of a very large array by counting chunks of it in a
+    pool of processes and merging the counts. Ties are broken as in `mode`.
+
+    Parameters
+    ----------
+    numbers : list or numpy array
+        array of nums
+    chunk_size : int
+        the number of values counted by each task
+    max_workers : int, optional
+        the number of processes; by default, one per CPU
+
+    Returns
+    -------
+    mode : int/float
+        the mode of numbers
+    """
+    if np is None:
+        return mode(numbers)
+
+    numbers = np.asarray(numbers).ravel()
+    if numbers.size == 0:
+        raise ValueError("The input array should not be empty")
+    if numbers.size <= chunk_size:
+        return array_mode(numbers)
+
+    chunks = [numbers[i:i + chunk_size] for i in range(0, numbers.size, chunk_size)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        shard_counts = list(executor.map(_count_values, chunks))
+
+    values, inverse = np.unique(
+        np.concatenate([shard_values for shard_values, _ in shard_counts]),
+        return_inverse=True
+    )
+    counts = np.zeros(len(values), dtype=np.int64)
+    np.add.at(counts, inverse, np.concatenate([shard_counts for _, shard_counts in shard_counts]))
+    return _first_to_reach_max(numbers, values, counts)
+
+
+def _count_values(numbers):
+    """Returns the distinct values of an array and how often each occurs."""
+    if numbers.dtype.kind in 'iub':
+        low, high = numbers.min().item(), numbers.max().item()
+        if high - low < 2 * numbers.size + (1 << 16):
+            # widen before shifting, so that booleans can be subtracted and
+            # small signed integers do not wrap around
+            if numbers.dtype.kind == 'u':
+                shifted = numbers - low
+            else:
+                shifted = numbers.astype(np.int64) - low
+            counts = np.bincount(shifted.astype(np.intp))
+            present = np.flatnonzero(counts)
+            return (present + low).astype(numbers.dtype), counts[present]
+    return np.unique(numbers, return_counts=True)
+
+
+def _first_to_reach_max(numbers, values, counts):
+    candidates = values[counts == counts.max()]
+    if len(candidates) == 1:
+        return candidates[0].item()
+
+    # a value reaches its count at its last occurrence, so of the tied
+    # values the winner is the one whose last occurrence comes first
+    positions = np.flatnonzero(np.isin(numbers, candidates))
+    tied_values = numbers[positions][::-1]
+    distinct, first_from_end = np.unique(tied_values, return_index=True)
+    last_occurrence = positions[::-1][first_from_end]
+    return distinct[np.argmin(last_occurrence)].item()
+
@@ -0,0 +1,412 @@
+import heapq
+import numpy as np
+
+METRICS = ('euclidean', 'manhattan')
+
+
+class _SpatialTree:
+    """
+    Base class for trees over points in d dimensions which answer nearest
+    neighbor queries.
+
+    The points are split recursively, at the median of their widest
+    dimension, until at most `leaf_size` remain in a node. Each node stores
+    the range of its points in `index`, a permutation of the point ids, and
+    a bound on their location; subclasses decide what kind of bound. A query
+    visits the nodes nearest first and skips any node whose bound is no
+    closer than the kth closest point found so far.
+
+    When the points fill many dimensions, few nodes can be skipped, and
+    visiting them one at a time costs more than computing every distance
+    at once. So a query which has visited more nodes than a full scan is
+    worth, about n * d / `_SCAN_COST` of them, gives up on the tree and
+    scans all the points instead. Once most of the recent queries have
+    given up, the tree is skipped and every query scans straight away, so
+    queries cost no more than a brute force search where the tree cannot
+    prune, and about twice as much while the tree is still being tried.
+    """
+
+    # the number of point coordinates NumPy can scan in the time it takes
+    # a query to visit one node, measured roughly
+    _SCAN_COST = 1024
+
+    def __init__(self, points, leaf_size: int = 16, metric: str = 'euclidean'):
+        if metric not in METRICS:
+            raise ValueError(f'metric must be one of {METRICS}.')
+        self.points = np.asarray(points, dtype=np.float64)
+        if self.points.ndim != 2:
+            raise ValueError('points must be an (n x d) array.')
+        self.metric = metric
+        self.leaf_size = max(1, leaf_size)
+        self.index = np.arange(len(self.points))
+        # a running average of how often queries give up on the tree
+        self._scan_rate = 0.0
+
+        self._start = []
+        self._end = []
+        self._left = []
+        self._right = []
+        self._bounds = []
+
+        if len(self.points):
+            self._build()
+        self._bounds = self._stack_bounds(self._bounds)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self):
+        stack = [(self._new_node(0, len(self.points)), 0, len(self.points))]
+        while stack:
+            node, start, end = stack.pop()
+            if end - start <= self.leaf_size:
+                continue
+
+            ids = self.index[start:end]
+            coordinates = self.points[ids]
+            dimension = np.argmax(coordinates.max(axis=0) - coordinates.min(axis=0))
+            middle = (end - start) // 2
+            order = np.argpartition(coordinates[:, dimension], middle)
+            self.index[start:end] = ids[order]
+
+            left = self._new_node(start, start + middle)
+            right = self._new_node(start + middle, end)
+            self._left[node] = left
+            self._right[node] = right
+            stack.append((left, start, start + middle))
+            stack.append((right, start + middle, end))
+
+    def _new_node(self, start, end):
+        self._start.append(start)
+        self._end.append(end)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._bounds.append(self._bound(self.points[self.index[start:end]]))
+        return len(self._start) - 1
+
+    def _distances(self, coordinates, q):
+        differences = np.abs(coordinates - q)
+        if self.metric == 'euclidean':
+            return np.sqrt(np.einsum('ij,ij->i', differences, differences))
+        return differences.sum(axis=1)
+
+    def _bound(self, coordinates):
+        raise NotImplementedError
+
+    def _stack_bounds(self, bounds):
+        raise NotImplementedError
+
+    def _min_distance(self, node, q):
+        """A lower bound on the distance from q to every point in a node."""
+        raise NotImplementedError
+
+    def query(self, q, k: int = 1):
+        """
+        Finds the k closest points to q.
+
+        Points at the same distance are ranked by id, whether the tree or
+        a scan answers the query.
+
+        Returns
+        -------
+        distances : array of float
+            the distances to the k closest points, in increasing order
+        ids : array of int
+            the rows of `points` which are the k closest points
+        """
+        if not 1 <= k <= len(self.points):
+            raise ValueError(f'k must be between 1 and {len(self.points)}.')
+        q = np.asarray(q, dtype=np.float64)
+
+        if self._scan_rate > 0.75:
+            # still try the tree now and then, in case the queries move
+            # somewhere it prunes well
+            self._scan_rate *= 0.999
+            return self._scan(q, k)
+        budget = max(8, self.points.size // self._SCAN_COST)
+
+        # a max-heap of the k closest points so far, as (-distance, -id), so
+        # that points at the same distance are ranked by id
+        closest = []
+        stack = [(0.0, 0)]
+        while stack:
+            bound, node = stack.pop()
+            if len(closest) == k and bound > -closest[0][0]:
+                continue
+            budget -= 1
+            if budget < 0:
+                self._scan_rate = 0.75 * self._scan_rate + 0.25
+                return self._scan(q, k)
+
+            left, right = self._left[node], self._right[node]
+            if left == -1:
+                ids = self.index[self._start[node]:self._end[node]]
+                for distance, i in zip(self._distances(self.points[ids], q).tolist(), ids.tolist()):
+                    if len(closest) < k:
+                        heapq.heappush(closest, (-distance, -i))
+                    elif (-distance, -i) > closest[0]:
+                        heapq.heapreplace(closest, (-distance, -i))
+                continue
+
+            # push the farther child first, so that the nearer one is visited first
+            left_bound = self._min_distance(left, q)
+            right_bound = self._min_distance(right, q)
+            if left_bound <= right_bound:
+                stack.append((right_bound, right))
+                stack.append((left_bound, left))
+            else:
+                stack.append((left_bound, left))
+                stack.append((right_bound, right))
+
+        self._scan_rate *= 0.75
+        closest.sort(reverse=True)
+        distances = np.array([-distance for distance, _ in closest])
+        ids = np.array([-i for _, i in closest], dtype=np.int64)
+        return distances, ids
+
+    def _scan(self, q, k):
+        """Finds the k closest points to q by computing every distance."""
+        distances = self._distances(self.points, q)
+        kth_distance = np.partition(distances, k - 1)[k - 1]
+        closer = np.flatnonzero(distances < kth_distance)
+        tied = np.flatnonzero(distances == kth_distance)[:k - len(closer)]
+        ids = np.concatenate([closer, tied])
+        ids = ids[np.lexsort((ids, distances[ids]))]
+        return distances[ids], ids
+
+    def query_many(self, qs, k: int = 1):
+        """Finds the k closest points to each row of `qs`, returning arrays
+        of distances and ids with one row per query."""
+        qs = np.atleast_2d(np.asarray(qs, dtype=np.float64))
+        distances = np.empty((len(qs), k))
+        ids = np.empty((len(qs), k), dtype=np.int64)
+        for row, q in enumerate(qs):
+            distances[row], ids[row] = self.query(q, k)
+        return distances, ids
+
+    def node_components(self, components):
+        """For each node, the component shared by all of its points, or -1
+        if its points lie in more than one component. `components` gives
+        the component of each point."""
+        result = np.empty(len(self._start), dtype=np.int64)
+        # children are created after their parents, so have larger ids
+        for node in reversed(range(len(self._start))):
+            left = self._left[node]
+            if left == -1:
+                labels = components[self.index[self._start[node]:self._end[node]]]
+                result[node] = labels[0] if (labels == labels[0]).all() else -1
+            else:
+                left_label, right_label = result[left], result[self._right[node]]
+                result[node] = left_label if left_label == right_label else -1
+        return result
+
+    def nearest_outside_all(self, components, node_components, component_bounds, lower_bounds):
+        """
+        Finds, for many points at once, the closest point in a different
+        component, as in each round of Borůvka's algorithm.
+
+        A point is searched from if its lower bound is below its component's
+        bound, and only points closer than the component's bound are found;
+        each find lowers the bound, so that the later searches from the same
+        component prune against it. The points of each leaf are searched
+        together: the tree is traversed once with the leaf's bounding box as
+        the query, and each leaf reached is compared with all of them at once.
+        Nodes whose points all lie in the component of every searching point
+        are skipped.
+
+        Parameters
+        ----------
+        components : array of int
+            the component of each point, numbered 0..n-1
+        node_components : array of int
+            from `node_components`
+        component_bounds : array of float
+            indexed by component; updated in place
+        lower_bounds : array of float
+            a lower bound on the distance from each point to the closest
+            point in another component
+
+        Returns
+        -------
+        distances, ids : arrays
+            the distance to and id of the point found for each point, or
+            inf and -1 where none was
+        """
+        n = len(self.points)
+        distances = np.full(n, np.inf)
+        neighbors = np.full(n, -1, dtype=np.int64)
+
+        for leaf in np.flatnonzero(np.asarray(self._left) == -1).tolist():
+            ids = self.index[self._start[leaf]:self._end[leaf]]
+            ids = ids[lower_bounds[ids] < component_bounds[components[ids]]]
+            if not len(ids):
+                continue
+
+            labels = components[ids]
+            coordinates = self.points[ids]
+            low, high = coordinates.min(axis=0), coordinates.max(axis=0)
+            shared = labels[0] if (labels == labels[0]).all() else -2
+            best = component_bounds[labels].copy()
+            best_id = np.full(len(ids), -1, dtype=np.int64)
+            rows = np.arange(len(ids))
+            # no node farther than this can improve any point's best
+            worst = best.max()
+
+            stack = [(0.0, 0)] if node_components[0] != shared else []
+            while stack:
+                node_bound, node = stack.pop()
+                if node_bound >= worst:
+                    continue
+
+                left, right = self._left[node], self._right[node]
+                if left == -1:
+                    others = self.index[self._start[node]:self._end[node]]
+                    pairwise = self._pairwise_distances(coordinates, self.points[others])
+                    pairwise[labels[:, None] == components[others][None, :]] = np.inf
+                    closest = pairwise.argmin(axis=1)
+                    closest_distance = pairwise[rows, closest]
+                    closer = closest_distance < best
+                    best[closer] = closest_distance[closer]
+                    best_id[closer] = others[closest[closer]]
+                    worst = best.max()
+                    continue
+
+                children = []
+                for child in (left, right):
+                    if node_components[child] != shared:
+                        child_bound = self._box_distance(child, low, high)
+                        if child_bound < worst:
+                            children.append((child_bound, child))
+                children.sort(reverse=True)
+                stack.extend(children)
+
+            found = best_id != -1
+            distances[ids[found]] = best[found]
+            neighbors[ids[found]] = best_id[found]
+            np.minimum.at(component_bounds, labels[found], best[found])
+
+        return distances, neighbors
+
+    def _pairwise_distances(self, a, b):
+        differences = np.abs(a[:, None, :] - b[None, :, :])
+        if self.metric == 'euclidean':
+            return np.sqrt(np.einsum('ijk,ijk->ij', differences, differences))
+        return differences.sum(axis=2)
+
+    def _box_distance(self, node, low, high):
+        """A lower bound on the distance from any point in the box from
+        `low` to `high` to every point in a node."""
+        raise NotImplementedError
+
+    def knn_distance(self, q, k: int):
+        """Returns the distance between q and the kth closest point to q,
+        along with the kth closest point itself."""
+        distances, ids = self.query(q, k)
+        return (distances[-1].item(), self.points[ids[-1]])
+
+    def knn_distance_many(self, qs, k: int):
+        """Returns the kth closest distances and points for each row of `qs`."""
+        distances, ids = self.query_many(qs, k)
+        return distances[:, -1], self.points[ids[:, -1]]
+
+
+class KDTree(_SpatialTree):
+    """
+    A k-d tree over an (n x d) array of points, whose nodes are bounded by
+    axis-aligned boxes. Best suited to low dimensions.
+
+    Parameters
+    ----------
+    points : array
+        of shape (n, d)
+    leaf_size : int
+        the largest number of points in a leaf
+    metric : str
+        'euclidean' or 'manhattan'
+
+    >>> points = np.array([[0., 0.], [1., 0.], [0., 2.], [5., 5.], [6., 5.]])
+    >>> tree = KDTree(points, leaf_size=1)
+    >>> distances, ids = tree.query([0.9, 0.1], k=2)
+    >>> distances.round(3).tolist(), ids.tolist()
+    ([0.141, 0.906], [1, 0])
+    >>> tree.knn_distance([5., 4.], 1)
+    (1.0, array([5., 5.]))
+    >>> KDTree(points, metric='manhattan').knn_distance_many([[0., 0.], [6., 6.]], 2)[0].tolist()
+    [1.0, 2.0]
+    """
+
+    def _bound(self, coordinates):
+        return coordinates.min(axis=0), coordinates.max(axis=0)
+
+    def _stack_bounds(self, bounds):
+        d = self.points.shape[1]
+        lows = np.array([low for low, _ in bounds]).reshape(-1, d)
+        highs = np.array([high for _, high in bounds]).reshape(-1, d)
+        return lows, highs
+
+    def _min_distance(self, node, q):
+        lows, highs = self._bounds
+        gaps = np.maximum(np.maximum(lows[node] - q, q - highs[node]), 0)
+        if self.metric == 'euclidean':
+            return float(np.sqrt(gaps @ gaps))
+        return float(gaps.sum())
+
+    def _box_distance(self, node, low, high):
+        lows, highs = self._bounds
+        gaps = np.maximum(np.maximum(lows[node] - high, low - highs[node]), 0)
+        if self.metric == 'euclidean':
+            return float(np.sqrt(gaps @ gaps))
+        return float(gaps.sum())
+
+
+class BallTree(_SpatialTree):
+    """
+    A ball tree over an (n x d) array of points, whose nodes are bounded by
+    balls around their centroids. Balls can fit points which lie near a
+    low dimensional surface in a higher dimensional space more tightly than
+    boxes do; on points which fill their space, KDTree prunes better. Either
+    way, past about 8 dimensions most queries fall back to a full scan.
+
+    Parameters
+    ----------
+    points : array
+        of shape (n, d)
+    leaf_size : int
+        the largest number of points in a leaf
+    metric : str
+        'euclidean' or 'manhattan'
+
+    >>> points = np.array([[0., 0.], [1., 0.], [0., 2.], [5., 5.], [6., 5.]])
+    >>> tree = BallTree(points, leaf_size=1)
+    >>> distances, ids = tree.query([0.9, 0.1], k=2)
+    >>> distances.round(3).tolist(), ids.tolist()
+    ([0.141, 0.906], [1, 0])
+    """
+
+    def _bound(self, coordinates):
+        centroid = coordinates.mean(axis=0)
+        return centroid, self._distances(coordinates, centroid).max()
+
+    def _stack_bounds(self, bounds):
+        d = self.points.shape[1]
+        centroids = np.array([centroid for centroid, _ in bounds]).reshape(-1, d)
+        radii = np.array([radius for _, radius in bounds])
+        return centroids, radii
+
+    def _min_distance(self, node, q):
+        centroids, radii = self._bounds
+        difference = np.abs(centroids[node] - q)
+        if self.metric == 'euclidean':
+            to_centroid = np.sqrt(difference @ difference)
+        else:
+            to_centroid = difference.sum()
+        return max(0.0, float(to_centroid - radii[node]))
+
+    def _box_distance(self, node, low, high):
+        centroids, radii = self._bounds
+        gaps = np.maximum(np.maximum(low - centroids[node], centroids[node] - high), 0)
+        if self.metric == 'euclidean':
+            to_centroid = np.sqrt(gaps @ gaps)
+        else:
+            to_centroid = gaps.sum()
+        return max(0.0, float(to_centroid - radii[node]))
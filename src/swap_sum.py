@@ -1,8 +1,16 @@
-def swap_sum(A, B):
+import os
+
+try:
+    import numpy as np
+except ImportError:  # swap_sum_memmap is unavailable without NumPy
+    np = None
+
+
+def swap_sum(A, B, target=10):
     """
     Given two sorted integer arrays A and B, returns a pair of indices (A_i, B_i) 
     – one from A and one from B – such that after swapping these indices, 
-    sum(B) == sum(A) + 10. 
+    sum(B) == sum(A) + target, where target is 10 by default. 
 
     If more than one pair is found, return any one of them. 
     If such a pair does not exist, return None.
@@ -15,29 +23,173 @@ def swap_sum(A, B):
     to return the indices.
 
     swap_sum should run in time Θ(n), where n is the size of the 
-    larger of the two lists. A and B should not be modified
+    larger of the two lists. A and B should not be modified.
+    Since both are sorted, they are walked with two pointers in
+    Θ(1) extra memory.
+
+    >>> swap_sum([1, 6, 50], [4, 24, 35])
+    (1, 0)
+    >>> swap_sum([1, 6, 50], [4, 24, 35], target=11) is None
+    True
+    """
+
+    delta = _required_difference(sum(A), sum(B), target)
+    if delta is None:
+        return None
+    return _find_pair(A, B, delta)
+
+
+def _find_pair(A, B, delta):
+    """Returns indices (i, j) with B[j] - A[i] == delta, or None, by walking
+    both sorted arrays once."""
+    i = j = 0
+    while i < len(A) and j < len(B):
+        difference = B[j] - A[i]
+        if difference == delta:
+            return (i, j)
+        elif difference < delta:
+            j += 1
+        else:
+            i += 1
+
+    return None
+
+
+def _required_difference(sum_A, sum_B, target):
+    """The value of B[j] - A[i] for which swapping A[i] and B[j] makes
+    sum(B) == sum(A) + target, or None if no integers can do it."""
+    diff = sum_B - sum_A - target
+    if diff % 2 != 0:
+        return None
+    return diff // 2
+
+
+def swap_sum_pairs(A, B, target=10):
     """
+    Lazily yields every pair of indices (i, j) such that swapping A[i] and
+    B[j] makes sum(B) == sum(A) + target, in increasing order of i.
+
+    Both arrays are walked once, so all pairs are found in Θ(n + p) time,
+    where p is the number of pairs.
+
+    >>> list(swap_sum_pairs([1, 6, 6, 50], [4, 4, 24, 35], target=8))
+    [(1, 0), (1, 1), (2, 0), (2, 1)]
+    """
+    delta = _required_difference(sum(A), sum(B), target)
+    if delta is None:
+        return
+
+    i = j = 0
+    while i < len(A) and j < len(B):
+        difference = B[j] - A[i]
+        if difference < delta:
+            j += 1
+        elif difference > delta:
+            i += 1
+        else:
+            # every copy of A[i] pairs with every copy of B[j]
+            i_end = i + 1
+            while i_end < len(A) and A[i_end] == A[i]:
+                i_end += 1
+            j_end = j + 1
+            while j_end < len(B) and B[j_end] == B[j]:
+                j_end += 1
+            for a_index in range(i, i_end):
+                for b_index in range(j, j_end):
+                    yield (a_index, b_index)
+            i, j = i_end, j_end
+
 
-    # Calculate the sums of A and B
+def swap_sum_many(A, B, targets):
+    """
+    Resolves many targets against the same pair of arrays, returning a list
+    aligned with `targets` of what `swap_sum(A, B, target)` would return.
+    The sums of A and B are computed only once.
+
+    >>> swap_sum_many([1, 6, 50], [4, 24, 35], [10, 11, 0])
+    [(1, 0), None, (0, 0)]
+    """
     sum_A = sum(A)
     sum_B = sum(B)
 
-    # define difference
-    diff = sum_B - sum_A - 10
-    
-    # base case
-    if diff % 2 == 1:
+    results = []
+    for target in targets:
+        delta = _required_difference(sum_A, sum_B, target)
+        results.append(None if delta is None else _find_pair(A, B, delta))
+    return results
+
+
+def swap_sum_memmap(A, B, target=10, chunk_size=1 << 20):
+    """
+    Solves swap_sum for sorted int64 arrays too large to fit in memory.
+
+    A and B may be numpy.memmap (or any NumPy) arrays, or paths to binary
+    files of native int64 values. The sums are computed in chunks, and the
+    two-pointer walk streams fixed-size windows of both arrays: each window
+    of A is matched against the current window of B with np.searchsorted,
+    and whichever window is exhausted first is advanced. At most one window
+    of each array is resident at a time.
+
+    Parameters
+    ----------
+    A, B : numpy array or path
+        sorted integer arrays
+    target : int
+        the desired value of sum(B) - sum(A) after the swap
+    chunk_size : int
+        the number of values in each window
+
+    Returns
+    -------
+    tuple : of indices (i, j) as in swap_sum, or None
+
+    >>> swap_sum_memmap(np.array([1, 6, 50]), np.array([4, 24, 35]), chunk_size=2)
+    (1, 0)
+    """
+    if np is None:
+        raise ImportError('swap_sum_memmap requires NumPy.')
+
+    A = _as_array(A)
+    B = _as_array(B)
+
+    delta = _required_difference(_chunked_sum(A, chunk_size), _chunked_sum(B, chunk_size), target)
+    if delta is None:
         return None
 
-    set_B = set(B)
+    # invariant: every value in B[:j] is smaller than A[i] + delta
+    i = j = 0
+    while i < len(A) and j < len(B):
+        wanted = np.asarray(A[i:i + chunk_size], dtype=np.int64) + delta
+        window = np.asarray(B[j:j + chunk_size], dtype=np.int64)
 
-    for i, a in enumerate(A):
-        # Calculate the value that needs to be in B for the sum to be correct
-        b = a + diff / 2
-        # If that value is in B, return the indices
-        if b in set_B:
-            j = B.index(b)
-            return (i, j)
+        positions = np.searchsorted(window, wanted)
+        in_window = positions < len(window)
+        found = in_window.copy()
+        found[in_window] = window[positions[in_window]] == wanted[in_window]
+        if found.any():
+            k = int(np.argmax(found))
+            return (i + k, j + int(positions[k]))
+
+        if wanted[-1] <= window[-1]:
+            # every value wanted by this window of A would have been in this window of B
+            i += len(wanted)
+        else:
+            # the values wanted beyond this window of B lie further along B
+            i += int(np.searchsorted(wanted, window[-1], side='right'))
+            j += len(window)
 
-    # edge case
     return None
+
+
+def _as_array(values):
+    if isinstance(values, (str, os.PathLike)):
+        return np.memmap(values, dtype=np.int64, mode='r')
+    return values
+
+
+def _chunked_sum(values, chunk_size):
+    total = 0
+    for start in range(0, len(values), chunk_size):
+        total += int(np.asarray(values[start:start + chunk_size]).sum(dtype=np.int64))
+    return total
+
@@ -0,0 +1,85 @@
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Optional
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class WeightCache:
+    """
+    A symmetric memoization layer for edge weight (or distance) functions.
+
+    Wraps either a function of two nodes, like the `weights` argument of
+    `cluster`, or a function of one edge, like the `d` argument of `slc`.
+    Results are keyed on the unordered pair of nodes, so the weight of an
+    edge is computed at most once no matter which endpoint it is seen from.
+    A cache can be passed anywhere the wrapped function is expected, and
+    reusing it across calls on the same graph reuses the prior weights.
+
+    Parameters
+    ----------
+    func : Callable
+        function of two nodes, or of one edge, returning its weight
+    maxsize : int, optional
+        the maximum number of weights to keep; the least recently used
+        weight is evicted first. If None, the cache is unbounded.
+
+    >>> calls = []
+    >>> def weights(x, y):
+    ...     calls.append((x, y))
+    ...     return abs(x - y)
+    >>> cached = WeightCache(weights, maxsize=2)
+    >>> cached(1, 3), cached(3, 1), cached((1, 3),)
+    (2, 2, 2)
+    >>> calls
+    [(1, 3)]
+    >>> cached(1, 4), cached(1, 5), cached(3, 1)
+    (3, 4, 2)
+    >>> cached.cache_info()
+    CacheInfo(hits=2, misses=4, maxsize=2, currsize=2)
+    """
+
+    def __init__(self, func: Callable[..., float], maxsize: Optional[int] = None):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError('maxsize must be a positive integer or None.')
+        self.func = func
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._weights = OrderedDict()
+
+    def __call__(self, *args: Any) -> float:
+        if len(args) == 1:
+            u, v = args[0]
+        else:
+            u, v = args
+        key = frozenset((u, v))
+
+        try:
+            weight = self._weights[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            if self.maxsize is not None:
+                self._weights.move_to_end(key)
+            return weight
+
+        self.misses += 1
+        weight = self.func(*args)
+        self._weights[key] = weight
+        if self.maxsize is not None and len(self._weights) > self.maxsize:
+            self._weights.popitem(last=False)
+        return weight
+
+    def __len__(self):
+        return len(self._weights)
+
+    def cache_info(self) -> CacheInfo:
+        """Returns the hit and miss statistics of the cache."""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._weights))
+
+    def cache_clear(self):
+        """Removes every cached weight and resets the statistics."""
+        self._weights.clear()
+        self.hits = 0
+        self.misses = 0